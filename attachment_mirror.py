@@ -0,0 +1,182 @@
+# attachment_mirror.py
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import uuid
+from collections import OrderedDict
+
+import aiohttp
+
+log = logging.getLogger(__name__)
+
+# Directory where mirrored attachments are stored, keyed by their SHA-256
+MIRROR_DIR = os.path.join("./config", "attachments")
+
+# Disk quota for the mirror, least recently used files are evicted beyond it
+MIRROR_QUOTA = int(os.getenv("ATTACHMENT_MIRROR_QUOTA_MB", "1024")) * 1024 * 1024
+
+# Number of attachments downloaded in parallel
+MIRROR_CONCURRENCY = 4
+
+CHUNK_SIZE = 64 * 1024
+
+
+async def download(session, url, directory):
+    """Streams a file into a temporary file in `directory` while hashing it.
+
+    The digest, and so the file's prefix directory, is only known at the
+    end, so the temporary file is written to `directory` itself; `load`
+    removes the ones an interrupted download left behind.
+
+    Returns (temporary path, SHA-256 digest, size).
+    """
+    temp_path = os.path.join(directory, f"{uuid.uuid4().hex}.part")
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        async with session.get(url) as response:
+            response.raise_for_status()
+            with open(temp_path, "wb") as f:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    sha256.update(chunk)
+                    size += len(chunk)
+                    await asyncio.to_thread(f.write, chunk)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return temp_path, sha256.hexdigest(), size
+
+
+class AttachmentMirror:
+    """Content-addressed local copies of attachments with an LRU disk quota.
+
+    Files are streamed to a temporary file while being hashed and then moved
+    to `<dir>/<hash[:2]>/<hash>`, so identical attachments are stored once.
+    A file's modification time doubles as its last access time, which keeps
+    the LRU order across restarts.
+    """
+
+    def __init__(
+        self,
+        directory=MIRROR_DIR,
+        quota=MIRROR_QUOTA,
+        concurrency=MIRROR_CONCURRENCY,
+        workers=None,
+    ):
+        self.directory = directory
+        self.workers = workers  # Worker pool that downloads, if running
+        self.quota = quota
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.session = None  # Shared HTTP session, created on first use
+        self.entries = OrderedDict()  # digest -> size, least recently used first
+        self.total_size = 0
+        self.stats_path = os.path.join(directory, "stats.json")
+        self.stats = {"downloads": 0, "dedup_hits": 0, "bytes_saved": 0, "evicted": 0}
+
+    def load(self):
+        """Scans the mirror directory and restores the LRU order. Blocking."""
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        for prefix in os.listdir(self.directory):
+            prefix_dir = os.path.join(self.directory, prefix)
+            if prefix.endswith(".part"):
+                # Leftover from a download interrupted by a crash or kill
+                os.remove(prefix_dir)
+                continue
+            if len(prefix) != 2 or not os.path.isdir(prefix_dir):
+                continue
+            for digest in os.listdir(prefix_dir):
+                if digest.endswith(".part"):
+                    # Leftover from an interrupted download
+                    os.remove(os.path.join(prefix_dir, digest))
+                    continue
+                stat = os.stat(os.path.join(prefix_dir, digest))
+                files.append((stat.st_mtime, digest, stat.st_size))
+
+        for _, digest, size in sorted(files):
+            self.entries[digest] = size
+            self.total_size += size
+
+        try:
+            with open(self.stats_path, "r") as f:
+                self.stats.update(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def path_for(self, digest):
+        """Returns the path of a mirrored file."""
+        return os.path.join(self.directory, digest[:2], digest)
+
+    async def mirror(self, url):
+        """Downloads a file into the mirror and returns its SHA-256 digest."""
+        async with self.semaphore:
+            if self.workers is not None and self.workers.remote:
+                # Download and hash in a worker process, only the result is
+                # filed into the mirror here
+                temp_path, digest, size = await self.workers.run(
+                    "attachment.fetch", url=url, directory=self.directory
+                )
+            else:
+                if self.session is None:
+                    self.session = aiohttp.ClientSession(
+                        timeout=aiohttp.ClientTimeout(total=300)
+                    )
+                temp_path, digest, size = await download(
+                    self.session, url, self.directory
+                )
+        return self.store(temp_path, digest, size)
+
+    def store(self, temp_path, digest, size):
+        """Files a downloaded temporary file into the mirror under its digest."""
+        self.stats["downloads"] += 1
+        if digest in self.entries:
+            # Already stored, keep the existing copy and mark it as used
+            os.remove(temp_path)
+            self.stats["dedup_hits"] += 1
+            self.stats["bytes_saved"] += size
+            self.touch(digest)
+        else:
+            path = self.path_for(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+            self.entries[digest] = size
+            self.total_size += size
+            self.evict()
+        return digest
+
+    def touch(self, digest):
+        """Marks a mirrored file as recently used."""
+        self.entries.move_to_end(digest)
+        try:
+            os.utime(self.path_for(digest))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """Removes least recently used files until the mirror fits its quota."""
+        # Never evict the most recent file, even if it alone exceeds the quota
+        while self.total_size > self.quota and len(self.entries) > 1:
+            digest, size = self.entries.popitem(last=False)
+            self.total_size -= size
+            self.stats["evicted"] += 1
+            try:
+                os.remove(self.path_for(digest))
+            except FileNotFoundError:
+                pass
+
+    def save_stats(self):
+        """Persists the counters. Blocking."""
+        try:
+            with open(self.stats_path, "w") as f:
+                json.dump(self.stats, f)
+        except OSError as e:
+            log.error(f"Failed to save attachment mirror stats: {e}")
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        await asyncio.to_thread(self.save_stats)
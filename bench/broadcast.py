@@ -0,0 +1,109 @@
+# bench/broadcast.py
+"""Benchmarks `bulk_msg` broadcasting against a local fake Discord HTTP API.
+
+Run from the repository root:
+
+    python -m bench.broadcast [--channels 50] [--latency 0.08]
+
+The fake server answers message sends after a fixed latency and returns the
+same per-channel rate-limit headers as Discord, so discord.py's own bucket
+handling is exercised exactly like in production.
+"""
+
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+
+import discord
+from aiohttp import web
+
+from cogs.msg import broadcast
+
+_message_ids = itertools.count(1)
+
+
+def json_response(data, headers=None):
+    # discord.py only decodes bodies whose content type is exactly application/json
+    headers = {**(headers or {}), "Content-Type": "application/json"}
+    return web.Response(body=json.dumps(data).encode(), headers=headers)
+
+
+def make_app(latency):
+    """Creates a minimal fake of the Discord REST API."""
+    user = {"id": "1", "username": "keroppi", "discriminator": "0", "avatar": None}
+
+    async def get_me(request):
+        return json_response(user)
+
+    async def create_message(request):
+        await asyncio.sleep(latency)
+        payload = await request.json()
+        channel_id = request.match_info["channel_id"]
+        headers = {
+            "X-RateLimit-Bucket": f"channel-{channel_id}",
+            "X-RateLimit-Limit": "5",
+            "X-RateLimit-Remaining": "4",
+            "X-RateLimit-Reset-After": "5",
+        }
+        message = {
+            "id": str(next(_message_ids)),
+            "channel_id": channel_id,
+            "author": user,
+            "content": payload.get("content", ""),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "edited_timestamp": None,
+            "tts": False,
+            "mention_everyone": False,
+            "mentions": [],
+            "mention_roles": [],
+            "attachments": [],
+            "embeds": [],
+            "pinned": False,
+            "type": 0,
+        }
+        return json_response(message, headers)
+
+    app = web.Application()
+    app.router.add_get("/api/v10/users/@me", get_me)
+    app.router.add_post("/api/v10/channels/{channel_id}/messages", create_message)
+    return app
+
+
+async def main(channel_count, latency):
+    runner = web.AppRunner(make_app(latency))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    # Point discord.py's REST client at the fake server
+    discord.http.Route.BASE = f"http://127.0.0.1:{port}/api/v10"
+    client = discord.Client(intents=discord.Intents.none())
+    await client.http.static_login("fake-token")
+
+    channels = [
+        client.get_partial_messageable(channel_id)
+        for channel_id in range(1000, 1000 + channel_count)
+    ]
+
+    try:
+        for label, concurrency in (("sequential", 1), ("concurrent", None)):
+            kwargs = {"concurrency": concurrency} if concurrency else {}
+            sent, failed, elapsed = await broadcast(channels, "benchmark", **kwargs)
+            print(
+                f"{label:>10}: {len(sent)} sent, {len(failed)} failed in "
+                f"{elapsed:.2f}s ({len(sent) / elapsed:.1f} msg/s)"
+            )
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--channels", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.08)
+    args = parser.parse_args()
+    asyncio.run(main(args.channels, args.latency))
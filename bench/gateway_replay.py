@@ -0,0 +1,287 @@
+# bench/gateway_replay.py
+"""Benchmarks gateway event handling with and without the SPEEDUPS mode.
+
+Run from the repository root:
+
+    python -m bench.gateway_replay [--events 50000] [--payloads FILE]
+
+Gateway payloads are compressed into a zlib stream exactly as Discord sends
+them and fed to discord.py's own websocket handler, so decompression, JSON
+decoding, state parsing and event dispatch all run as they do in production.
+Every combination of event loop and JSON codec that is installed is timed.
+
+Without `--payloads` a synthetic mix of guild traffic is generated from a
+fixed seed. To replay real traffic, record it first; this connects with the
+bot's token and intents and writes every payload received to a file:
+
+    python -m bench.gateway_replay --record FILE [--duration 600]
+"""
+
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import random
+import time
+import zlib
+
+import discord
+from discord.ext import commands
+from discord.gateway import DiscordWebSocket
+from dotenv import load_dotenv
+
+import speedups
+
+GUILD_ID = 100
+CHANNEL_COUNT = 50
+MEMBER_COUNT = 500
+
+# Recorded events that are left out of the replay
+REPLAY_SKIP = {"READY", "RESUMED"}
+
+
+def _user(user_id):
+    return {
+        "id": str(user_id),
+        "username": f"user{user_id}",
+        "discriminator": "0",
+        "global_name": None,
+        "avatar": None,
+    }
+
+
+def synthetic_payloads(count, seed=0):
+    """Returns a GUILD_CREATE followed by `count` events of typical traffic."""
+    rng = random.Random(seed)
+    now = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc).isoformat()
+    channels = [
+        {"id": str(1000 + i), "type": 0, "name": f"channel-{i}", "position": i}
+        for i in range(CHANNEL_COUNT)
+    ]
+    members = [
+        {
+            "user": _user(10_000 + i),
+            "roles": [],
+            "joined_at": now,
+            "deaf": False,
+            "mute": False,
+            "flags": 0,
+        }
+        for i in range(MEMBER_COUNT)
+    ]
+    guild = {
+        "id": str(GUILD_ID),
+        "name": "Benchmark",
+        "owner_id": "10000",
+        "roles": [
+            {
+                "id": str(GUILD_ID),
+                "name": "@everyone",
+                "permissions": "0",
+                "position": 0,
+                "color": 0,
+                "hoist": False,
+                "managed": False,
+                "mentionable": False,
+            }
+        ],
+        "emojis": [],
+        "stickers": [],
+        "features": [],
+        "channels": channels,
+        "threads": [],
+        "members": members,
+        "presences": [],
+        "voice_states": [],
+        "member_count": MEMBER_COUNT,
+        "large": False,
+    }
+    payloads = [{"op": 0, "t": "GUILD_CREATE", "s": 1, "d": guild}]
+
+    message_ids = itertools.count(1_000_000)
+    sent = []  # (channel ID, message ID) of earlier messages, to refer to
+    for seq in range(2, count + 2):
+        channel_id = rng.choice(channels)["id"]
+        member = rng.choice(members)
+        roll = rng.random()
+        if roll < 0.6 or not sent:
+            message_id = str(next(message_ids))
+            sent.append((channel_id, message_id))
+            words = rng.randint(3, 40)
+            event, data = "MESSAGE_CREATE", {
+                "id": message_id,
+                "channel_id": channel_id,
+                "guild_id": str(GUILD_ID),
+                "author": member["user"],
+                "member": {k: v for k, v in member.items() if k != "user"},
+                "content": " ".join(
+                    rng.choice(("hello", "keroppi", "docker", "ping", "lol"))
+                    for _ in range(words)
+                ),
+                "timestamp": now,
+                "edited_timestamp": None,
+                "tts": False,
+                "mention_everyone": False,
+                "mentions": [],
+                "mention_roles": [],
+                "attachments": [],
+                "embeds": [],
+                "pinned": False,
+                "type": 0,
+            }
+        elif roll < 0.8:
+            event, data = "TYPING_START", {
+                "channel_id": channel_id,
+                "guild_id": str(GUILD_ID),
+                "user_id": member["user"]["id"],
+                "timestamp": 1704067200,
+                "member": member,
+            }
+        elif roll < 0.9:
+            channel_id, message_id = rng.choice(sent)
+            event, data = "MESSAGE_REACTION_ADD", {
+                "user_id": member["user"]["id"],
+                "channel_id": channel_id,
+                "message_id": message_id,
+                "guild_id": str(GUILD_ID),
+                "emoji": {"id": None, "name": "🐸"},
+                "type": 0,
+                "burst": False,
+            }
+        else:
+            channel_id, message_id = rng.choice(sent)
+            event, data = "MESSAGE_UPDATE", {
+                "id": message_id,
+                "channel_id": channel_id,
+                "guild_id": str(GUILD_ID),
+                "content": "edited",
+                "edited_timestamp": now,
+            }
+        payloads.append({"op": 0, "t": event, "s": seq, "d": data})
+    return payloads
+
+
+def compress(payloads):
+    """Encodes payloads into the frames of a zlib-stream gateway connection."""
+    compressor = zlib.compressobj()
+    return [
+        compressor.compress(json.dumps(payload).encode())
+        + compressor.flush(zlib.Z_SYNC_FLUSH)
+        for payload in payloads
+    ]
+
+
+async def replay(frames):
+    """Feeds frames through a bot's gateway handler, returns (seconds, events)."""
+    bot = commands.Bot(command_prefix="!", intents=discord.Intents.default())
+    handled = 0
+
+    @bot.listen()
+    async def on_message(message):
+        nonlocal handled
+        handled += 1
+
+    async with bot:  # Attaches the bot to the running loop, closes it after
+        # Normally set by READY, commands compare message authors to it
+        bot._connection.user = discord.ClientUser(state=bot._connection, data=_user(1))
+        ws = DiscordWebSocket(None, loop=asyncio.get_running_loop())
+        ws._connection = bot._connection
+        ws._discord_parsers = bot._connection.parsers
+        ws._dispatch = bot.dispatch
+        ws.shard_id = None
+
+        start = time.perf_counter()
+        for frame in frames:
+            await ws.received_message(frame)
+        # Let the dispatched event handlers run
+        while len(asyncio.all_tasks()) > 1:
+            await asyncio.sleep(0)
+        elapsed = time.perf_counter() - start
+    return elapsed, handled
+
+
+def modes():
+    """Yields (label, loop factory, JSON setup) for every installed combination."""
+    loops = [("asyncio", None)]
+    if speedups.uvloop_factory() is not None:
+        loops.append(("uvloop", speedups.uvloop_factory()))
+    codecs = [("json", speedups.use_stdlib_json), ("orjson", speedups.use_orjson)]
+    for (loop_name, loop_factory), (codec_name, use_codec) in itertools.product(
+        loops, codecs
+    ):
+        yield f"{loop_name} + {codec_name}", loop_factory, use_codec
+
+
+def benchmark(payloads, rounds):
+    frames = compress(payloads)
+    print(f"Replaying {len(payloads)} payloads ({sum(map(len, frames))} bytes)")
+    baseline = None
+    for label, loop_factory, use_codec in modes():
+        if use_codec() is False:
+            print(f"{label:>18}: not installed")
+            continue
+        times = []
+        for _ in range(rounds):
+            with asyncio.Runner(loop_factory=loop_factory) as runner:
+                elapsed, handled = runner.run(replay(frames))
+            times.append(elapsed)
+        best = min(times)
+        baseline = baseline or best
+        print(
+            f"{label:>18}: {len(payloads) / best:,.0f} events/s, "
+            f"{handled} messages handled ({baseline / best:.2f}x)"
+        )
+
+
+async def record(path, duration):
+    """Writes the gateway payloads the bot receives to `path`, one per line."""
+    load_dotenv()
+    intents = discord.Intents.default()
+    intents.message_content = True
+    client = discord.Client(intents=intents, enable_debug_events=True)
+    count = 0
+
+    with open(path, "w", encoding="utf-8") as file:
+
+        @client.event
+        async def on_socket_raw_receive(payload):
+            nonlocal count
+            file.write(payload + "\n")
+            count += 1
+
+        async with client:
+            task = asyncio.create_task(client.start(os.environ["DISCORD_TOKEN"]))
+            try:
+                await asyncio.wait_for(asyncio.shield(task), duration)
+            except asyncio.TimeoutError:
+                pass
+    print(f"Recorded {count} payloads to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=50_000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--payloads", help="JSON lines file of recorded payloads")
+    parser.add_argument("--record", metavar="FILE", help="record payloads to FILE")
+    parser.add_argument("--duration", type=float, default=600)
+    args = parser.parse_args()
+
+    if args.record:
+        asyncio.run(record(args.record, args.duration))
+    else:
+        if args.payloads:
+            with open(args.payloads, encoding="utf-8") as file:
+                payloads = [json.loads(line) for line in file if line.strip()]
+            # Only events are replayed; READY would wait for the guilds to
+            # stream in, and the other opcodes need a live connection
+            payloads = [
+                payload
+                for payload in payloads
+                if payload.get("op") == 0 and payload.get("t") not in REPLAY_SKIP
+            ]
+        else:
+            payloads = synthetic_payloads(args.events)
+        benchmark(payloads, args.rounds)
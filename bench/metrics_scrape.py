@@ -0,0 +1,184 @@
+# bench/metrics_scrape.py
+"""Scrapes the `/metrics` endpoint and checks the Prometheus text format.
+
+Run from the repository root:
+
+    python -m bench.metrics_scrape [--url http://localhost:9100/metrics]
+
+Without `--url` a metrics server is started on a free local port for a stub
+bot with sample commands, counters, rate limits and shards, and scraped over
+HTTP exactly like Prometheus would. With `--url` a running bot is scraped.
+Exits with status 1 if the output is malformed.
+"""
+
+import argparse
+import asyncio
+import logging
+import re
+import sys
+from types import SimpleNamespace
+
+import aiohttp
+
+from metrics import Metrics, RateLimitFilter
+from metrics_server import MetricsServer
+from shard_stats import ShardStats
+
+SAMPLE = re.compile(
+    r"^(?P<name>[a-zA-Z_:][a-zA-Z0-9_:]*)"
+    r'(?:\{(?P<labels>[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*"'
+    r'(?:,[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*")*)\})?'
+    r" (?P<value>\S+)$"
+)
+LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_value(value):
+    """Parses a sample value, None if it isn't a valid one."""
+    if value in ("NaN", "+Inf", "-Inf"):
+        return float(value.replace("Inf", "inf").replace("NaN", "nan"))
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def check_exposition(text):
+    """Returns the problems found in a text exposition, empty if it's valid."""
+    problems = []
+    types = {}  # metric family -> type
+    histograms = {}  # (family, labels without le) -> [(le, count)]
+    counts = {}  # (family, labels) -> value of _count
+
+    if not text.endswith("\n"):
+        problems.append("The output doesn't end with a newline.")
+
+    for number, line in enumerate(text.splitlines(), 1):
+        if line.startswith("# TYPE "):
+            parts = line.split(" ")
+            if len(parts) != 4 or parts[3] not in ("counter", "gauge", "histogram"):
+                problems.append(f"Line {number}: malformed TYPE: {line}")
+            elif parts[2] in types:
+                problems.append(f"Line {number}: second TYPE for {parts[2]}")
+            else:
+                types[parts[2]] = parts[3]
+            continue
+        if line.startswith("#"):
+            continue
+
+        match = SAMPLE.match(line)
+        if match is None:
+            problems.append(f"Line {number}: malformed sample: {line}")
+            continue
+        name = match["name"]
+        labels = dict(LABEL.findall(match["labels"] or ""))
+        value = parse_value(match["value"])
+        if value is None:
+            problems.append(f"Line {number}: malformed value: {line}")
+            continue
+
+        family = re.sub(r"_(bucket|sum|count)$", "", name)
+        if name not in types and types.get(family) != "histogram":
+            problems.append(f"Line {number}: {name} has no TYPE before it")
+        elif types.get(name) == "counter" and not value >= 0:
+            problems.append(f"Line {number}: counter {name} is negative")
+
+        if types.get(family) == "histogram" and name != family:
+            key = (
+                family,
+                tuple(sorted((k, v) for k, v in labels.items() if k != "le")),
+            )
+            if name.endswith("_bucket"):
+                histograms.setdefault(key, []).append((labels.get("le"), value))
+            elif name.endswith("_count"):
+                counts[key] = value
+
+    for key, buckets in histograms.items():
+        family = key[0]
+        values = [count for _, count in buckets]
+        if values != sorted(values):
+            problems.append(f"{family}{dict(key[1])}: buckets aren't cumulative")
+        if buckets[-1][0] != "+Inf":
+            problems.append(f"{family}{dict(key[1])}: the last bucket isn't +Inf")
+        elif counts.get(key) != buckets[-1][1]:
+            problems.append(f"{family}{dict(key[1])}: +Inf bucket differs from _count")
+    return problems
+
+
+def stub_bot():
+    """A bot with sample metrics, enough for the metrics server to render."""
+    metrics = Metrics()
+    bot = SimpleNamespace(metrics=metrics, latency=0.042)
+    bot.shard_stats = ShardStats(metrics)
+
+    for seconds in (0.01, 0.2, 0.2, 3.0):
+        metrics.observe("commands", "ping", seconds)
+    metrics.observe("docker_calls", "list", 0.05)
+    metrics.inc("command_errors", 'say "hi"')  # Quotes must be escaped
+    metrics.inc("gateway_events", "0", 1234)
+    metrics.register_gauge("scheduled_messages", "Pending messages.", lambda: 3)
+    metrics.register_gauge("broken", "A callback that fails.", lambda: 1 / 0)
+
+    # A bucket 429 and a global 429, logged as discord.py logs them
+    logger = logging.getLogger("bench.metrics_scrape.http")
+    logger.propagate = False
+    logger.addHandler(logging.NullHandler())
+    logger.addFilter(RateLimitFilter(metrics))
+    logger.warning("We are being rate limited. %s %s responded with 429.", "GET", "/")
+    logger.warning("We are being rate limited. %s %s responded with 429.", "GET", "/")
+    logger.warning("Global rate limit has been hit. Retrying in %.2f seconds.", 1.0)
+    return bot
+
+
+async def scrape(url):
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url) as response:
+            response.raise_for_status()
+            return response.headers.get("Content-Type", ""), await response.text()
+
+
+async def main(url):
+    server = None
+    if url is None:
+        server = MetricsServer(stub_bot(), host="127.0.0.1", port=0)
+        # The metrics server logs an error for the failing gauge on purpose
+        logging.getLogger("metrics_server").disabled = True
+        await server.start()
+        host, port = server.runner.addresses[0][:2]
+        url = f"http://{host}:{port}/metrics"
+    try:
+        content_type, text = await scrape(url)
+    finally:
+        if server is not None:
+            await server.stop()
+
+    problems = check_exposition(text)
+    if not content_type.startswith("text/plain; version=0.0.4"):
+        problems.append(f"Unexpected content type {content_type!r}")
+    if server is not None:
+        expected = {
+            'keroppi_discord_http_429_total{scope="bucket"} 1',
+            'keroppi_discord_http_429_total{scope="global"} 1',
+            'keroppi_command_duration_seconds_count{command="ping"} 4',
+            'keroppi_command_errors_total{command="say \\"hi\\""} 1',
+            "keroppi_scheduled_messages 3",
+        }
+        lines = set(text.splitlines())
+        problems += [f"Missing sample: {sample}" for sample in expected - lines]
+        if any(line.startswith("keroppi_broken") for line in lines):
+            problems.append("A failing gauge was rendered")
+
+    samples = sum(1 for line in text.splitlines() if not line.startswith("#"))
+    print(f"Scraped {url}: {samples} samples, {len(text)} bytes.")
+    for problem in problems:
+        print(f"  ✗ {problem}")
+    if not problems:
+        print("  ✓ Valid Prometheus text exposition.")
+    return not problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Scrape a running bot instead of a stub")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main(args.url)) else 1)
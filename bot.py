@@ -2,44 +2,67 @@ import os
 import sys
 import logging
 import asyncio
-from discord.ext import commands
+import tracemalloc
 from dotenv import load_dotenv
-import discord
-import json
 
-# Configure logging to output to the console
-logging.basicConfig(stream=sys.stdout, level=logging.INFO)
-
-# Load environment variables from the .env file
+# Load environment variables from the .env file before the modules below read them
 load_dotenv()
+
+from cache_config import bot_options
+from cog_config import CONFIG_DIR, read_cog_config, save_cog_config
+from cog_registry import PROTECTED_COGS, CogRegistry
+from cog_stats import TRACEMALLOC, InstrumentedBot, InstrumentedShardedBot
+from config_store import GuildConfigStore
+from log_config import setup_logging
+from metrics_server import METRICS_PORT, MetricsServer
+from shutdown import ShutdownCoordinator
+from speedups import install as install_speedups
+from stall_detector import STALL_THRESHOLD, StallDetector
+from worker_pool import WORKERS, LocalRunner, WorkerPool
+
+# Send all logging through a background thread that writes JSON lines to the
+# console, so a slow log driver can't hold up the event loop
+log_listener = setup_logging()
+log = logging.getLogger("bot")
+
 TOKEN = os.getenv("DISCORD_TOKEN")
 
 # Passing command prefix through .env
 COMMAND_PREFIX = os.getenv("COMMAND_PREFIX", "!")
 
+# Set to 1 to spread the guilds over several gateway connections (shards).
+# Discord recommends the shard count unless SHARD_COUNT is set
+SHARDED = os.getenv("SHARDED", "0") == "1"
+SHARD_COUNT = os.getenv("SHARD_COUNT")
+
 # Check if the token is provided in the .env file
 if not TOKEN:
-    logging.error("DISCORD_TOKEN not found in environment variables.")
+    log.error("DISCORD_TOKEN not found in environment variables.")
+    log_listener.stop()
     sys.exit("Missing DISCORD_TOKEN. Please check your .env file.")
 
-# Set up the required bot intents
-intents = discord.Intents.default()
-intents.message_content = True
-
-# Create bot instance
-bot = commands.Bot(command_prefix=COMMAND_PREFIX, intents=intents)
+# Intents and cache sizes, from INTENTS, MAX_MESSAGES, MEMBER_CACHE and
+# CHUNK_GUILDS or config/cache_config.json
+try:
+    cache_options = bot_options()
+except ValueError as e:
+    log.error(f"Invalid cache configuration: {e}")
+    log_listener.stop()
+    sys.exit(f"Invalid cache configuration: {e}")
+
+# Create bot instance, it keeps per-cog counters for !cogstats
+if SHARDED:
+    bot = InstrumentedShardedBot(
+        command_prefix=COMMAND_PREFIX,
+        shard_count=int(SHARD_COUNT) if SHARD_COUNT else None,
+        **cache_options,
+    )
+else:
+    bot = InstrumentedBot(command_prefix=COMMAND_PREFIX, **cache_options)
 
 @bot.event
 async def on_ready():
-    logging.info(f"{bot.user} is now online and ready. Use commands with prefix {COMMAND_PREFIX}.")
-
-
-# List of cogs that should always be loaded and cannot be unloaded
-PROTECTED_COGS = ["cogs.core", "cogs.help"]
-
-# Path to the cogs configuration file
-CONFIG_DIR = "./config"
-CONFIG_FILE = os.path.join(CONFIG_DIR, "cogs_config.json")
+    log.info(f"{bot.user} is now online and ready. Use commands with prefix {COMMAND_PREFIX}.")
 
 
 async def load_extensions():
@@ -52,59 +75,112 @@ async def load_extensions():
     for cog in PROTECTED_COGS:
         try:
             await bot.load_extension(cog)
-            logging.info(f"Successfully loaded protected cog: {cog}")
+            bot.cog_registry.mark_loaded(cog)
+            log.info(f"Successfully loaded protected cog: {cog}")
         except Exception as e:
-            logging.error(f"Failed to load protected cog {cog}: {e}")
+            log.error(f"Failed to load protected cog {cog}: {e}")
             # Since these are protected cogs, exit if they fail to load
             sys.exit(f"Error loading protected cog {cog}. Exiting.")
 
-    # Load other cogs from the configuration file
-    loaded_cogs = []
+    # Load other cogs from the configuration file, recovering from the backup if
+    # it is damaged. Exclude protected cogs if they are somehow in the list
+    loaded_cogs = [cog for cog in read_cog_config() if cog not in PROTECTED_COGS]
 
-    # Try to read the configuration file
-    try:
-        with open(CONFIG_FILE, "r") as f:
-            data = json.load(f)
-            loaded_cogs = data.get("loaded_cogs", [])
-            # Exclude protected cogs if they are somehow in the list
-            loaded_cogs = [cog for cog in loaded_cogs if cog not in PROTECTED_COGS]
-    except FileNotFoundError:
-        # If the config file is missing, create it with an empty list
-        with open(CONFIG_FILE, "w") as f:
-            json.dump({"loaded_cogs": []}, f, indent=4)
-        logging.info("Created new cogs configuration file.")
-    except json.JSONDecodeError as e:
-        logging.error(f"Error reading cogs configuration file: {e}")
-        # Reset the config file due to error
-        with open(CONFIG_FILE, "w") as f:
-            json.dump({"loaded_cogs": []}, f, indent=4)
-        logging.info("Reset cogs configuration file due to error.")
+    # Drop cogs whose files no longer exist instead of failing on them every start
+    available_cogs = bot.cog_registry.extensions()
+    for cog in loaded_cogs:
+        if cog not in available_cogs:
+            log.warning(f"Cog {cog} is in the configuration but was not found.")
+    loaded_cogs = [cog for cog in loaded_cogs if cog in available_cogs]
+
+    # Write the list back so a missing or damaged file is repaired right away
+    await save_cog_config(loaded_cogs)
 
     # Now load the cogs from the configuration file
     for cog in loaded_cogs:
         try:
             await bot.load_extension(cog)
-            logging.info(f"Successfully loaded cog: {cog}")
+            bot.cog_registry.mark_loaded(cog)
+            log.info(f"Successfully loaded cog: {cog}")
         except Exception as e:
-            logging.error(f"Failed to load cog {cog}: {e}")
+            log.error(f"Failed to load cog {cog}: {e}")
             # Continue loading other cogs even if one fails
 
 
 async def main():
     """Main entry point for the bot."""
+    # Record which cog starts each task, and optionally what memory it holds
+    bot.cog_stats.install(asyncio.get_running_loop())
+    if TRACEMALLOC:
+        tracemalloc.start()
+
+    # Watchdog thread that reports blocking calls on the event loop
+    bot.stall_detector = None
+    if STALL_THRESHOLD > 0:
+        bot.stall_detector = StallDetector(bot.metrics)
+        bot.stall_detector.start()
+
+    # Per-guild settings shared by all cogs, loaded before any cog needs them
+    bot.config_store = GuildConfigStore()
+    await asyncio.to_thread(bot.config_store.load)
+
+    # Discovered once here, then only rescanned when the cogs folder changes
+    bot.cog_registry = CogRegistry()
+    await asyncio.to_thread(bot.cog_registry.refresh)
+
+    # Heavy jobs go to worker processes if WORKERS is set, else to threads
+    bot.workers = LocalRunner(bot.metrics)
+    if WORKERS > 0:
+        pool = WorkerPool(metrics=bot.metrics)
+        try:
+            await pool.start()
+            bot.workers = pool
+        except (OSError, RuntimeError) as e:
+            log.error(f"Failed to start worker processes, running jobs in threads: {e}")
+            await pool.stop()
+
     await load_extensions()
+
+    # Optional Prometheus endpoint, served from the bot's own event loop
+    metrics_server = None
+    if METRICS_PORT:
+        metrics_server = MetricsServer(bot)
+        await metrics_server.start()
+
+    # SIGTERM (docker stop) and SIGINT finish running work before closing
+    shutdown = ShutdownCoordinator(bot)
+    shutdown.install(asyncio.get_running_loop())
+
     try:
         await bot.start(TOKEN)
     except KeyboardInterrupt:
-        logging.info("Bot shutdown requested by user.")
+        log.info("Bot shutdown requested by user.")
     except Exception as e:
-        logging.critical(f"An unexpected error occurred: {e}")
+        log.critical(f"An unexpected error occurred: {e}")
     finally:
-        pass
+        if shutdown.task is not None:
+            await shutdown.task
+        elif not bot.is_closed():
+            # Stopped by an error, still unload the cogs so they save their work
+            await bot.close()
+        # Write out settings that are still waiting in the write-behind cache,
+        # including what the cogs stored while unloading
+        await bot.config_store.close()
+        # After the cogs unloaded, which may still have run jobs
+        await bot.workers.stop()
+        if metrics_server is not None:
+            await metrics_server.stop()
+        if bot.stall_detector is not None:
+            bot.stall_detector.stop()
 
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        # uvloop and orjson if SPEEDUPS=1, the standard event loop otherwise
+        with asyncio.Runner(loop_factory=install_speedups()) as runner:
+            runner.run(main())
     except Exception as e:
-        logging.critical(f"An error occurred in the main event loop: {e}")
+        log.critical(f"An error occurred in the main event loop: {e}")
+    finally:
+        # Write out whatever is still queued
+        log_listener.stop()
@@ -0,0 +1,209 @@
+# cache_config.py
+import json
+import logging
+import os
+import sys
+
+import discord
+
+from cog_config import CONFIG_DIR
+
+log = logging.getLogger(__name__)
+
+# Optional file with the same settings as the environment variables below,
+# e.g. {"intents": "default,message_content,-typing", "max_messages": 200}.
+# Environment variables take precedence over it
+CACHE_CONFIG_FILE = os.path.join(CONFIG_DIR, "cache_config.json")
+
+# setting -> (environment variable, default)
+SETTINGS = {
+    # Comma separated: a base of "default", "all" or "none", then intents to
+    # add, or to remove with a leading "-"
+    "intents": ("INTENTS", "default,message_content"),
+    # Messages kept in memory for edits, reactions and prompts, 0 disables
+    "max_messages": ("MAX_MESSAGES", "1000"),
+    # Members kept in memory: "auto" (what the intents allow), "none", or a
+    # comma separated list of "voice" and "joined"
+    "member_cache": ("MEMBER_CACHE", "auto"),
+    # Whether all members of every guild are requested at startup, "auto"
+    # does so only with the members intent
+    "chunk_guilds": ("CHUNK_GUILDS", "auto"),
+}
+
+# How many objects of a cache are measured to estimate the size of all of them
+SIZE_SAMPLE = 50
+
+
+def read_cache_config():
+    """Returns the cache settings from the environment, the config file and
+    the defaults, in that order of precedence."""
+    settings = {name: default for name, (_, default) in SETTINGS.items()}
+    try:
+        with open(CACHE_CONFIG_FILE, "r") as f:
+            stored = json.load(f)
+    except FileNotFoundError:
+        stored = {}
+    except json.JSONDecodeError as e:
+        log.error(f"Error reading cache configuration file {CACHE_CONFIG_FILE}: {e}")
+        stored = {}
+    for name, (variable, _) in SETTINGS.items():
+        if name in stored:
+            settings[name] = str(stored[name])
+        if os.getenv(variable):
+            settings[name] = os.getenv(variable)
+    return settings
+
+
+def parse_intents(spec):
+    """Builds the intents from e.g. "default,message_content,-typing"."""
+    names = [name.strip().lower() for name in spec.split(",") if name.strip()]
+    base = {"default": discord.Intents.default, "all": discord.Intents.all}
+    if names and names[0] in (*base, "none"):
+        first = names.pop(0)
+        intents = base[first]() if first in base else discord.Intents.none()
+    else:
+        intents = discord.Intents.none()
+    for name in names:
+        enabled = not name.startswith("-")
+        name = name.lstrip("-+")
+        if name not in discord.Intents.VALID_FLAGS:
+            raise ValueError(f"Unknown intent {name!r} in INTENTS.")
+        setattr(intents, name, enabled)
+    return intents
+
+
+def parse_member_cache(spec, intents):
+    spec = spec.strip().lower()
+    if spec == "auto":
+        return discord.MemberCacheFlags.from_intents(intents)
+    flags = discord.MemberCacheFlags.none()
+    if spec == "none":
+        return flags
+    for name in spec.split(","):
+        name = name.strip()
+        if name not in discord.MemberCacheFlags.VALID_FLAGS:
+            raise ValueError(f"Unknown member cache flag {name!r} in MEMBER_CACHE.")
+        setattr(flags, name, True)
+    return flags
+
+
+def parse_flag(spec, variable):
+    spec = spec.strip().lower()
+    if spec in ("1", "true", "yes", "on"):
+        return True
+    if spec in ("0", "false", "no", "off"):
+        return False
+    raise ValueError(f"{variable} must be auto, 1 or 0, not {spec!r}.")
+
+
+def bot_options(settings=None):
+    """Returns the keyword arguments for the bot's intents and caches.
+
+    Raises ValueError for settings that don't make sense, including member
+    cache flags the intents can't keep up to date.
+    """
+    settings = settings or read_cache_config()
+    intents = parse_intents(settings["intents"])
+
+    try:
+        max_messages = int(settings["max_messages"])
+    except ValueError:
+        raise ValueError("MAX_MESSAGES must be a number.") from None
+    member_cache_flags = parse_member_cache(settings["member_cache"], intents)
+    if member_cache_flags.voice and not intents.voice_states:
+        raise ValueError("MEMBER_CACHE voice needs the voice_states intent.")
+    if member_cache_flags.joined and not intents.members:
+        raise ValueError("MEMBER_CACHE joined needs the members intent.")
+
+    chunk_guilds = settings["chunk_guilds"].strip().lower()
+    if chunk_guilds == "auto":
+        chunk_guilds = intents.members
+    else:
+        chunk_guilds = parse_flag(chunk_guilds, "CHUNK_GUILDS")
+        if chunk_guilds and not intents.members:
+            raise ValueError("CHUNK_GUILDS needs the members intent.")
+
+    return {
+        "intents": intents,
+        # discord.py treats 0 as the default size, None turns the cache off
+        "max_messages": max_messages if max_messages > 0 else None,
+        "member_cache_flags": member_cache_flags,
+        "chunk_guilds_at_startup": chunk_guilds,
+    }
+
+
+def process_rss():
+    """Returns the resident memory of the process in bytes, None if unknown."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None  # Not on Linux
+
+
+def _shallow_size(obj):
+    """Size of an object and the values in its own slots or dict."""
+    size = sys.getsizeof(obj)
+    values = list((getattr(obj, "__dict__", None) or {}).values())
+    for cls in type(obj).__mro__:
+        for name in getattr(cls, "__slots__", ()):
+            value = getattr(obj, name, None)
+            if value is not None:
+                values.append(value)
+    for value in values:
+        # Other cached objects and the shared state are counted on their own
+        if isinstance(value, (str, bytes, int, float, tuple, list, dict)):
+            size += sys.getsizeof(value)
+    return size
+
+
+def estimate_size(objects, count):
+    """Estimates the memory of `count` objects from a sample of `objects`."""
+    sample = []
+    for obj in objects:
+        sample.append(_shallow_size(obj))
+        if len(sample) == SIZE_SAMPLE:
+            break
+    if not sample:
+        return 0
+    return sum(sample) / len(sample) * count
+
+
+def cache_report(bot):
+    """Returns (cache, objects, limit, estimated bytes) for discord.py's caches.
+
+    The sizes are rough: only a few objects of each cache are measured, and
+    only shallowly, so this is cheap enough to run on the event loop but is
+    not the resident memory each cache costs. The caches are private to
+    discord.py; one that a future version renames is reported as empty.
+    """
+    state = bot._connection
+    guilds = bot.guilds
+    messages = getattr(state, "_messages", None) or ()
+
+    def state_cache(attribute):
+        cache = getattr(state, attribute, None) or {}
+        return len(cache), iter(cache.values())
+
+    def guild_cache(attribute):
+        caches = [getattr(guild, attribute, None) or {} for guild in guilds]
+        count = sum(len(cache) for cache in caches)
+        objects = (obj for cache in caches for obj in cache.values())
+        return count, objects
+
+    caches = {
+        "Messages": (len(messages), iter(messages)),
+        "Members": guild_cache("_members"),
+        "Users": state_cache("_users"),
+        "Guilds": (len(guilds), iter(guilds)),
+        "Channels": guild_cache("_channels"),
+        "Threads": guild_cache("_threads"),
+        "Roles": guild_cache("_roles"),
+        "Emojis": state_cache("_emojis"),
+        "Stickers": state_cache("_stickers"),
+    }
+    limits = {"Messages": getattr(state, "max_messages", None) or 0}
+    return [
+        (name, count, limits.get(name), estimate_size(objects, count))
+        for name, (count, objects) in caches.items()
+    ]
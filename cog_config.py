@@ -0,0 +1,67 @@
+# cog_config.py
+import asyncio
+import json
+import logging
+import os
+
+log = logging.getLogger(__name__)
+
+# Directory and file for storing cog configurations
+CONFIG_DIR = "./config"
+CONFIG_FILE = os.path.join(CONFIG_DIR, "cogs_config.json")
+BACKUP_FILE = f"{CONFIG_FILE}.bak"  # Copy of the last successfully written state
+
+# Serializes writes so a slow flush can't be overtaken by a newer one
+_write_lock = asyncio.Lock()
+
+
+def _read(path):
+    with open(path, "r") as f:
+        loaded_cogs = json.load(f)["loaded_cogs"]
+    if not isinstance(loaded_cogs, list):
+        raise ValueError("loaded_cogs is not a list")
+    return loaded_cogs
+
+
+def read_cog_config():
+    """Returns the saved list of loaded cogs.
+
+    Falls back to the backup if the config file is missing or damaged, and
+    only starts with an empty list if both are unusable.
+    """
+    for path in (CONFIG_FILE, BACKUP_FILE):
+        try:
+            loaded_cogs = _read(path)
+        except FileNotFoundError:
+            continue
+        except (json.JSONDecodeError, KeyError, ValueError) as e:
+            log.error(f"Error reading cogs configuration file {path}: {e}")
+            continue
+        if path == BACKUP_FILE:
+            log.warning("Recovered cogs configuration from backup.")
+        return loaded_cogs
+    return []
+
+
+def _write_atomic(path, data):
+    """Writes a file through a temporary file and a rename, never partially."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(data, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def write_cog_config(loaded_cogs):
+    """Atomically saves the list of loaded cogs and refreshes the backup. Blocking."""
+    os.makedirs(CONFIG_DIR, exist_ok=True)
+    data = {"loaded_cogs": loaded_cogs}
+    _write_atomic(CONFIG_FILE, data)
+    _write_atomic(BACKUP_FILE, data)
+
+
+async def save_cog_config(loaded_cogs):
+    """Saves the list of loaded cogs from a thread, off the event loop."""
+    async with _write_lock:
+        await asyncio.to_thread(write_cog_config, list(loaded_cogs))
@@ -0,0 +1,281 @@
+# cog_registry.py
+import ast
+import hashlib
+import importlib
+import logging
+import os
+import sys
+
+log = logging.getLogger(__name__)
+
+# Directory and package where the cogs are stored
+COGS_DIR = "./cogs"
+COGS_PACKAGE = "cogs"
+
+# Directory holding the helper modules the cogs import (decorators.py, ...)
+ROOT_DIR = "."
+
+# Local modules that must never be reloaded. Reloading the entry point would
+# create a second bot, and the others hold state shared by the whole bot
+# (metrics, the worker pool, the settings store, registries, ...) or classes
+# of objects it created at startup, which a reload would disconnect from it
+STATIC_MODULES = {
+    "bot",
+    "cache_config",
+    "cog_config",
+    "cog_registry",
+    "cog_stats",
+    "config_store",
+    "log_config",
+    "metrics",
+    "metrics_server",
+    "shard_stats",
+    "shutdown",
+    "single_flight",
+    "speedups",
+    "stall_detector",
+    "task_registry",
+    "worker_jobs",
+    "worker_pool",
+}
+
+# Module the worker processes run their jobs from
+WORKER_MODULE = "worker_jobs"
+
+# List of cogs that should always be loaded and cannot be unloaded
+PROTECTED_COGS = ["cogs.core", "cogs.help"]
+
+
+class SourceFile:
+    """What is known about one cog or helper module file."""
+
+    def __init__(self, module, path, mtime, size, sha256, cog_classes, imports):
+        self.module = module  # e.g. "cogs.msg" or "decorators"
+        self.path = path
+        self.mtime = mtime
+        self.size = size
+        self.sha256 = sha256
+        self.cog_classes = cog_classes  # Names of the Cog subclasses defined
+        self.imports = imports  # Top-level modules imported by the file
+
+
+def _parse(source):
+    """Returns the Cog classes defined and the modules imported by a source file."""
+    cog_classes = []
+    imports = set()
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return cog_classes, imports
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef):
+            for base in node.bases:
+                name = (
+                    base.attr
+                    if isinstance(base, ast.Attribute)
+                    else getattr(base, "id", None)
+                )
+                if name in ("Cog", "GroupCog"):
+                    cog_classes.append(node.name)
+                    break
+        elif isinstance(node, ast.Import):
+            imports.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            imports.add(node.module.split(".")[0])
+    return cog_classes, imports
+
+
+def _scan(module, path, previous):
+    """Returns the SourceFile of a path, reusing `previous` if the file is unchanged.
+
+    Returns None if the file doesn't exist.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if (
+        previous is not None
+        and previous.mtime == stat.st_mtime_ns
+        and previous.size == stat.st_size
+    ):
+        return previous
+    with open(path, "rb") as f:
+        source = f.read()
+    cog_classes, imports = _parse(source)
+    return SourceFile(
+        module,
+        path,
+        stat.st_mtime_ns,
+        stat.st_size,
+        hashlib.sha256(source).hexdigest(),
+        cog_classes,
+        imports,
+    )
+
+
+def reload_module(name):
+    """Re-executes an imported helper module in place, restoring it on failure."""
+    module = sys.modules.get(name)
+    if module is None:
+        return  # Not imported yet, the next import picks up the new code
+    namespace = dict(module.__dict__)
+    try:
+        importlib.reload(module)
+    except BaseException:
+        module.__dict__.clear()
+        module.__dict__.update(namespace)
+        raise
+
+
+class CogRegistry:
+    """Cached view of the extensions in the cogs folder.
+
+    The folder is only listed again when its modification time changes (a
+    file was added, removed or renamed), and a file is only read and hashed
+    again when its own modification time or size changes, so refreshing is
+    a handful of `stat` calls.
+
+    The registry also remembers the hashes of every file an extension was
+    loaded from, including the local helper modules it imports, so it can
+    tell which extensions are out of date.
+    """
+
+    def __init__(self, directory=COGS_DIR, package=COGS_PACKAGE, root=ROOT_DIR):
+        self.directory = directory
+        self.package = package
+        self.root = root
+        self.directory_mtime = None
+        self.files = {}  # extension -> SourceFile
+        self.helpers = {}  # helper module -> SourceFile
+        self.loaded = {}  # extension -> {module: sha256} at load time
+
+    def refresh(self):
+        """Updates the registry from disk. Returns True if anything changed."""
+        changed = False
+        try:
+            directory_mtime = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            log.warning(f"Cogs folder '{self.directory}' not found.")
+            changed = bool(self.files)
+            self.files = {}
+            self.directory_mtime = None
+            return changed
+
+        if directory_mtime != self.directory_mtime:
+            self.directory_mtime = directory_mtime
+            filenames = {
+                filename
+                for filename in os.listdir(self.directory)
+                if filename.endswith(".py") and filename != "__init__.py"
+            }
+            extensions = {f"{self.package}.{filename[:-3]}" for filename in filenames}
+            for extension in set(self.files) - extensions:
+                del self.files[extension]
+                changed = True
+            for extension in extensions - set(self.files):
+                self.files[extension] = None  # Scanned below
+        for extension, previous in list(self.files.items()):
+            path = os.path.join(self.directory, f"{extension.split('.')[-1]}.py")
+            source_file = _scan(extension, path, previous)
+            if source_file is None:
+                del self.files[extension]
+                changed = True
+            elif source_file is not previous:
+                self.files[extension] = source_file
+                changed = True
+        return changed
+
+    def extensions(self, include_protected=False):
+        """Returns the sorted extension names found in the cogs folder."""
+        self.refresh()
+        return sorted(
+            extension
+            for extension in self.files
+            if include_protected or extension not in PROTECTED_COGS
+        )
+
+    def get(self, extension):
+        """Returns the SourceFile of an extension, or None if there is no such file."""
+        self.refresh()
+        return self.files.get(extension)
+
+    def helper(self, name):
+        """Returns the SourceFile of a local helper module, or None."""
+        if name in STATIC_MODULES:
+            return None
+        source_file = _scan(
+            name, os.path.join(self.root, f"{name}.py"), self.helpers.get(name)
+        )
+        if source_file is None:
+            self.helpers.pop(name, None)
+        else:
+            self.helpers[name] = source_file
+        return source_file
+
+    def dependencies(self, module, seen=None):
+        """Returns the local helper modules a module imports, directly or not.
+
+        Dependencies come before the modules that import them.
+        """
+        seen = set() if seen is None else seen
+        source_file = self.files.get(module) or self.helper(module)
+        order = []
+        for name in sorted(source_file.imports) if source_file else []:
+            if name in seen or self.helper(name) is None:
+                continue
+            seen.add(name)
+            order.extend(self.dependencies(name, seen))
+            order.append(name)
+        return order
+
+    def worker_dependencies(self):
+        """Returns the helper modules the worker processes import.
+
+        Workers import them once at startup, so reloading them in the bot
+        doesn't change the code the workers run.
+        """
+        source_file = _scan(
+            WORKER_MODULE, os.path.join(self.root, f"{WORKER_MODULE}.py"), None
+        )
+        names = set()
+        for name in source_file.imports if source_file else []:
+            if self.helper(name) is not None:
+                names.add(name)
+                names.update(self.dependencies(name))
+        return names
+
+    def fingerprint(self, extension):
+        """Returns {module: sha256} for an extension and its helper modules."""
+        source_file = self.get(extension)
+        if source_file is None:
+            return {}
+        digests = {extension: source_file.sha256}
+        for name in self.dependencies(extension):
+            digests[name] = self.helpers[name].sha256
+        return digests
+
+    def mark_loaded(self, extension):
+        """Records the files an extension was just loaded from."""
+        self.loaded[extension] = self.fingerprint(extension)
+
+    def forget(self, extension):
+        """Forgets an unloaded extension."""
+        self.loaded.pop(extension, None)
+
+    def changed_since_load(self, extension):
+        """Returns the modules of an extension that changed since it was loaded.
+
+        Helper modules come first, in the order they should be reloaded.
+        """
+        loaded = self.loaded.get(extension)
+        if loaded is None:
+            return []
+        current = self.fingerprint(extension)
+        changed = [
+            module
+            for module in self.dependencies(extension) + [extension]
+            if current.get(module) != loaded.get(module)
+        ]
+        return changed
@@ -0,0 +1,223 @@
+# cog_stats.py
+import asyncio
+import logging
+import os
+import sys
+import time
+import tracemalloc
+import weakref
+from collections import Counter, defaultdict
+
+from discord.ext import commands
+
+from cog_registry import COGS_PACKAGE
+from metrics import CountedView, Metrics, RateLimitFilter
+from shard_stats import ShardStats
+from single_flight import SingleFlight
+from task_registry import CANCEL_TIMEOUT, TaskRegistry
+
+# Set to 1 to trace memory allocations so `!cogstats` can attribute memory to
+# cogs. Tracing slows the bot down noticeably, so it is off by default
+TRACEMALLOC = os.getenv("COG_TRACEMALLOC", "0") == "1"
+
+# How many caller frames are searched for the cog that created a task
+OWNER_SEARCH_DEPTH = 12
+
+
+class CogStats:
+    """Cheap, always-on counters of what each extension costs.
+
+    Everything is keyed by module name, which for a cog is its extension name
+    (e.g. "cogs.msg"). Tasks are attributed to the cog whose code created
+    them (or, failing that, whose coroutine they run) when they are created,
+    and only weak references are kept, so finished tasks are not retained.
+    """
+
+    def __init__(self):
+        self.tasks = defaultdict(weakref.WeakSet)  # module -> tasks it created
+        self.handler_calls = Counter()  # module -> event handler calls
+        self.handler_time = defaultdict(float)  # module -> seconds in handlers
+        self.commands = Counter()  # module -> commands invoked
+        self.command_time = defaultdict(float)  # module -> seconds in commands
+
+    @staticmethod
+    def owner_of(coro):
+        """Returns the cog module responsible for a coroutine, or None."""
+        prefix = f"{COGS_PACKAGE}."
+        frame = getattr(coro, "cr_frame", None)
+        module = frame.f_globals.get("__name__", "") if frame else ""
+        if module.startswith(prefix):
+            return module
+        # The coroutine belongs to a library (e.g. a delayed message.delete),
+        # look for the cog further up the stack that created the task
+        frame = sys._getframe(2)
+        for _ in range(OWNER_SEARCH_DEPTH):
+            if frame is None:
+                break
+            module = frame.f_globals.get("__name__", "")
+            if module.startswith(prefix):
+                return module
+            frame = frame.f_back
+        return None
+
+    def task_factory(self, loop, coro, **kwargs):
+        """Event loop task factory that records which cog started each task."""
+        task = asyncio.Task(coro, loop=loop, **kwargs)
+        module = self.owner_of(coro)
+        if module is not None:
+            self.tasks[module].add(task)
+        return task
+
+    def install(self, loop):
+        loop.set_task_factory(self.task_factory)
+
+    def live_tasks(self, module):
+        return sum(not task.done() for task in self.tasks.get(module, ()))
+
+    def record_handler(self, module, elapsed):
+        self.handler_calls[module] += 1
+        self.handler_time[module] += elapsed
+
+    def record_command(self, module, elapsed):
+        self.commands[module] += 1
+        self.command_time[module] += elapsed
+
+    @staticmethod
+    def memory_usage(modules):
+        """Returns {module: bytes} still allocated by code in each module's file.
+
+        Only allocations made directly in the file are counted, not those made
+        by libraries on its behalf. Returns None if tracing is off. Blocking.
+        """
+        if not tracemalloc.is_tracing():
+            return None
+        files = {}
+        for module in modules:
+            path = getattr(sys.modules.get(module), "__file__", None)
+            if path:
+                files[os.path.abspath(path)] = module
+        usage = dict.fromkeys(modules, 0)
+        snapshot = tracemalloc.take_snapshot()
+        for stat in snapshot.statistics("filename"):
+            module = files.get(os.path.abspath(stat.traceback[0].filename))
+            if module is not None:
+                usage[module] += stat.size
+        return usage
+
+
+class InstrumentedBot(commands.Bot):
+    """Bot that measures its cogs and commands.
+
+    Every event handler and command is timed per extension for `!cogstats`.
+    Global invoke hooks record each command's latency in a histogram, and
+    errors, cancellations and timed out prompts and views are counted for
+    `!stats`, as are gateway events and reconnects per shard. Background tasks
+    cogs spawn through `tasks` are cancelled when the cog is removed, and
+    `single_flight` lets cogs share fetches between identical commands.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cog_stats = CogStats()
+        self.metrics = Metrics()
+        self.tasks = TaskRegistry()
+        self.shard_stats = ShardStats(self.metrics)
+        self.shard_stats.install(self)
+        self.single_flight = SingleFlight(self.metrics)
+        # Task running a command -> its context, for shutdown and unloads
+        self.running_commands = {}
+        CountedView.metrics = self.metrics
+        # The 429s are counted from discord.py's warnings, which must be
+        # created even when LOG_LEVEL hides them; the log handler drops them
+        http_log = logging.getLogger("discord.http")
+        if http_log.getEffectiveLevel() > logging.WARNING:
+            http_log.setLevel(logging.WARNING)
+        http_log.addFilter(RateLimitFilter(self.metrics))
+        self.before_invoke(self.start_command_timer)
+        self.after_invoke(self.record_command_latency)
+        self.add_listener(self.count_command_error, "on_command_error")
+        self.add_listener(self.count_command_cancellation, "on_command_completion")
+
+    async def _run_event(self, coro, event_name, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            await super()._run_event(coro, event_name, *args, **kwargs)
+        finally:
+            self.cog_stats.record_handler(
+                getattr(coro, "__module__", None), time.perf_counter() - start
+            )
+
+    async def remove_cog(self, name, /, **kwargs):
+        # Commands are cancelled before the cog's own cog_unload, so it can
+        # close what they use; background tasks after it, so it can still
+        # save their queues
+        cog = self.get_cog(name)
+        if cog is not None:
+            await self.cancel_commands(cog)
+        cog = await super().remove_cog(name, **kwargs)
+        if cog is not None:
+            await self.tasks.cancel(cog)
+        return cog
+
+    async def cancel_commands(self, cog, timeout=CANCEL_TIMEOUT):
+        """Cancels the cog's running commands and waits up to `timeout` seconds
+        for them. The command doing the unload, if it's the cog's own, is
+        left alone."""
+        current = asyncio.current_task()
+        tasks = [
+            task
+            for task, ctx in self.running_commands.items()
+            if ctx.cog is cog and task is not current and not task.done()
+        ]
+        if not tasks:
+            return
+        for task in tasks:
+            task.cancel()
+        await asyncio.wait(tasks, timeout=timeout)
+
+    async def invoke(self, ctx):
+        if ctx.command is None:
+            return await super().invoke(ctx)
+        task = asyncio.current_task()
+        self.running_commands[task] = ctx
+        start = time.perf_counter()
+        try:
+            await super().invoke(ctx)
+        finally:
+            self.running_commands.pop(task, None)
+            self.cog_stats.record_command(
+                ctx.command.module, time.perf_counter() - start
+            )
+
+    async def wait_for(self, event, /, *, check=None, timeout=None):
+        try:
+            return await super().wait_for(event, check=check, timeout=timeout)
+        except asyncio.TimeoutError:
+            # Nobody answered an interactive prompt in time
+            self.metrics.inc("prompt_timeouts", event)
+            raise
+
+    async def start_command_timer(self, ctx):
+        ctx.invoke_started = time.perf_counter()
+
+    async def record_command_latency(self, ctx):
+        # After-invoke hooks run whether the command succeeded or not
+        started = getattr(ctx, "invoke_started", None)
+        if started is not None:
+            self.metrics.observe(
+                "commands", ctx.command.qualified_name, time.perf_counter() - started
+            )
+
+    async def count_command_error(self, ctx, error):
+        if ctx.command is not None:
+            self.metrics.inc("command_errors", ctx.command.qualified_name)
+
+    async def count_command_cancellation(self, ctx):
+        # discord.py swallows a cancelled command and reports it as completed,
+        # with only the failed flag set
+        if ctx.command_failed:
+            self.metrics.inc("command_cancellations", ctx.command.qualified_name)
+
+
+class InstrumentedShardedBot(InstrumentedBot, commands.AutoShardedBot):
+    """InstrumentedBot that spreads its guilds over several gateway connections."""
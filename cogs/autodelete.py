@@ -1,8 +1,12 @@
 import discord
 from discord.ext import commands
 import asyncio
+import logging
+import time
 from decorators import delete_command_message, delete_bot_response
 
+log = logging.getLogger(__name__)
+
 
 class AutoDelete(
     commands.Cog,
@@ -11,8 +15,122 @@ class AutoDelete(
 
     def __init__(self, bot):
         self.bot = bot
+        self.config = bot.config_store  # Per-guild settings
         self.default_command_delete_delay = None  # Default is not to delete commands
         self.default_response_delete_delay = None  # Default is not to delete responses
+        # Messages waiting for their delay to pass:
+        # message ID -> (guild ID, channel ID, due timestamp)
+        self.pending_deletions = {}
+        bot.metrics.register_gauge(
+            "pending_deletions",
+            "Messages waiting to be deleted by the autodelete cog.",
+            lambda: len(self.pending_deletions),
+        )
+
+    async def cog_load(self):
+        if self.bot.is_ready():
+            self.restore_deletions()
+
+    def cog_unload(self):
+        self.bot.metrics.unregister_gauge("pending_deletions")
+        # Save the queue so the deletions still happen after a reload or
+        # restart; the waiting tasks are cancelled by the task registry
+        queued = {}
+        for message_id, (guild_id, channel_id, due) in self.pending_deletions.items():
+            queued.setdefault(guild_id, []).append([channel_id, message_id, due])
+        for guild_id, entries in queued.items():
+            saved = self.config.get(guild_id, "autodelete_pending", [])
+            self.config.set(guild_id, "autodelete_pending", saved + entries)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        self.restore_deletions()
+
+    def restore_deletions(self):
+        """Queues the deletions saved by the last unload again."""
+        for guild_id, entries in self.config.all("autodelete_pending").items():
+            self.config.delete(guild_id, "autodelete_pending")
+            for channel_id, message_id, due in entries:
+                self.queue_deletion(guild_id, channel_id, message_id, due)
+
+    def queue_deletion(self, guild_id, channel_id, message_id, due):
+        """Deletes a message at the `due` timestamp in a background task."""
+        self.pending_deletions[message_id] = (guild_id, channel_id, due)
+        self.bot.tasks.spawn(
+            self,
+            self.delete_later(channel_id, message_id, due),
+            name=f"delete message {message_id}",
+        )
+
+    async def delete_later(self, channel_id, message_id, due):
+        try:
+            await asyncio.sleep(max(0, due - time.time()))
+            await self.bot.http.delete_message(channel_id, message_id)
+        except discord.errors.NotFound:
+            pass  # Message was already deleted
+        except discord.errors.Forbidden:
+            log.warning(f"No permission to delete message {message_id} in channel {channel_id}")
+        except Exception as e:
+            log.exception(f"Unexpected error when deleting a message: {e}")
+        finally:
+            self.pending_deletions.pop(message_id, None)
+
+    def get_default_delay(self, guild, key, fallback):
+        """Returns a guild's default delay, or the global fallback."""
+        if guild is None:
+            return fallback
+        return self.config.get(guild.id, key, fallback)
+
+    @commands.command(name="autodelete_defaults", aliases=["set_autodelete"])
+    @commands.has_permissions(manage_guild=True)
+    @delete_command_message(delay=0)
+    @delete_bot_response(delay=15)
+    async def autodelete_defaults(
+        self, ctx, command_delay: str = None, response_delay: str = None
+    ):
+        """Sets this server's deletion delays for commands without their own setting.
+
+        **Usage:**
+        `!autodelete_defaults` - Shows the current defaults.
+        `!autodelete_defaults <command_delay|off> <response_delay|off>`
+
+        **Example:**
+        `!autodelete_defaults 5 off`
+        """
+        if command_delay is not None:
+            for key, value in (
+                ("autodelete_command_delay", command_delay),
+                ("autodelete_response_delay", response_delay),
+            ):
+                if value is None:
+                    continue
+                if value.lower() == "off":
+                    self.config.delete(ctx.guild.id, key)
+                    continue
+                try:
+                    delay = float(value)
+                except ValueError:
+                    delay = -1
+                if delay < 0:
+                    await ctx.send(
+                        f"❌ `{value}` is not a valid delay. Use seconds or `off`.",
+                        delete_after=10,
+                    )
+                    return
+                self.config.set(ctx.guild.id, key, delay)
+
+        def describe(delay):
+            return "off" if delay is None else f"{delay:g}s"
+
+        command_default = self.get_default_delay(
+            ctx.guild, "autodelete_command_delay", self.default_command_delete_delay
+        )
+        response_default = self.get_default_delay(
+            ctx.guild, "autodelete_response_delay", self.default_response_delete_delay
+        )
+        await ctx.send(
+            f"🧹 Default delays: commands **{describe(command_default)}**, responses **{describe(response_default)}**."
+        )
 
     @commands.Cog.listener()
     async def on_message(self, message):
@@ -27,7 +145,11 @@ class AutoDelete(
             delay = getattr(
                 ctx.command.callback,
                 "_delete_command_delay",
-                self.default_command_delete_delay,
+                self.get_default_delay(
+                    message.guild,
+                    "autodelete_command_delay",
+                    self.default_command_delete_delay,
+                ),
             )
             if delay is not None:
                 # Ensure the bot has permission to manage messages
@@ -37,16 +159,13 @@ class AutoDelete(
                         message.guild.me
                     ).manage_messages
                 ):
-                    try:
-                        # Delete the command message after the specified delay
-                        await asyncio.sleep(delay)
-                        await message.delete()
-                    except discord.errors.NotFound:
-                        pass  # Message was already deleted
-                    except discord.errors.Forbidden:
-                        print(f"⚠️ No permission to delete message in {message.channel}")
-                    except Exception as e:
-                        print(f"Unexpected error when deleting a message: {e}")
+                    # Delete the command message after the specified delay
+                    self.queue_deletion(
+                        message.guild.id,
+                        message.channel.id,
+                        message.id,
+                        time.time() + delay,
+                    )
 
     @commands.Cog.listener()
     async def on_command_completion(self, ctx):
@@ -59,7 +178,11 @@ class AutoDelete(
         delay = getattr(
             ctx.command.callback,
             "_delete_response_delay",
-            self.default_response_delete_delay,
+            self.get_default_delay(
+                ctx.guild,
+                "autodelete_response_delay",
+                self.default_response_delete_delay,
+            ),
         )
         if delay is not None:
             # Check if the bot has permission to delete messages in the current channel
@@ -71,17 +194,10 @@ class AutoDelete(
                 # Find the bot's latest response after the user's command
                 async for response in ctx.channel.history(limit=5, after=ctx.message):
                     if response.author == self.bot.user:
-                        try:
-                            await asyncio.sleep(delay)  # Wait for the specified delay
-                            await response.delete()  # Delete the bot's response
-                        except discord.errors.NotFound:
-                            pass  # The message was already deleted
-                        except discord.errors.Forbidden:
-                            print(
-                                f"⚠️ No permission to delete bot response in {response.channel}"
-                            )
-                        except Exception as e:
-                            print(f"Unexpected error while deleting bot response: {e}")
+                        # Delete the bot's response after the specified delay
+                        self.queue_deletion(
+                            ctx.guild.id, response.channel.id, response.id, time.time() + delay
+                        )
                         break  # Stop after deleting the first response
 
 
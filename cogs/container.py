@@ -1,9 +1,17 @@
+import logging
+import os
+import time
 import discord
 from discord.ext import commands
-import docker
 from datetime import datetime, timezone
-from bot import COMMAND_PREFIX
 from decorators import delete_command_message, delete_bot_response
+from metrics import CountedView
+from worker_pool import WorkerError
+
+log = logging.getLogger(__name__)
+
+# Read directly instead of importing bot.py, which would create a second bot
+COMMAND_PREFIX = os.getenv("COMMAND_PREFIX", "!")
 
 
 class Container(commands.Cog):
@@ -11,12 +19,17 @@ class Container(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
-        # Attempt to connect to Docker socket
+
+    async def docker_call(self, operation, job, **args):
+        """Runs a Docker job off the event loop (in a worker process if there
+        are any) and records how long the call took."""
+        start = time.perf_counter()
         try:
-            self.client = docker.from_env()
-        except docker.errors.DockerException as e:
-            self.client = None  # Handling Docker socket connection error
-            print(f"Error connecting to Docker: {e}")
+            return await self.bot.workers.run(job, **args)
+        finally:
+            self.bot.metrics.observe(
+                "docker_calls", operation, time.perf_counter() - start
+            )
 
     @commands.command(aliases=["ps"])
     @delete_command_message(delay=0)
@@ -24,17 +37,15 @@ class Container(commands.Cog):
     async def docker_ps(self, ctx):
         f"""Lists all Docker containers with detailed information.
         *Usage:* `{COMMAND_PREFIX}docker_ps`"""
-        if self.client is None:
-            await ctx.send(
-                "❌ Docker client is not available. Please check Docker connection."
-            )
-            return
         try:
-            # Get lists of running and stopped containers
-            running_containers = self.client.containers.list()
-            all_containers = self.client.containers.list(all=True)
+            # Get lists of running and stopped containers, shared with anyone
+            # else asking at the same time
+            running_containers, all_containers = await self.bot.single_flight.run(
+                "docker_ps", (), self.list_containers
+            )
+            running_names = {c["name"] for c in running_containers}
             stopped_containers = [
-                c for c in all_containers if c not in running_containers
+                c for c in all_containers if c["name"] not in running_names
             ]
 
             # Prepare the container info
@@ -60,19 +71,28 @@ class Container(commands.Cog):
             for embed in embeds:
                 await ctx.send(embed=embed)
 
+        except WorkerError as e:
+            if e.kind == "DockerException":
+                log.error(f"Error connecting to Docker: {e}")
+                await ctx.send(
+                    "❌ Docker client is not available. Please check Docker connection."
+                )
+            else:
+                await ctx.send(f"⚠️ An unexpected error occurred: {e}")
         except Exception as e:
             await ctx.send(f"⚠️ An unexpected error occurred: {e}")
 
+    async def list_containers(self):
+        """Returns the running containers and all containers."""
+        running = await self.docker_call("list", "docker.list")
+        return running, await self.docker_call("list", "docker.list", all=True)
+
     def format_container_info(self, container, running=True):
         """Formats container information for display."""
         # Get container details
-        name = container.name
-        image = (
-            container.image.tags[0]
-            if container.image.tags
-            else container.image.short_id
-        )
-        status = container.status.capitalize()
+        name = container["name"]
+        image = container["image"]
+        status = container["status"].capitalize()
         uptime = self.get_uptime(container)
         emoji = "🟢" if running else "🔴"
         info = (
@@ -87,9 +107,7 @@ class Container(commands.Cog):
     def get_uptime(self, container):
         """Calculates the uptime of the container."""
         try:
-            started_at_str = container.attrs["State"]["StartedAt"].replace(
-                "Z", "+00:00"
-            )
+            started_at_str = container["started_at"].replace("Z", "+00:00")
             started_at = datetime.fromisoformat(started_at_str)
             now = datetime.now(timezone.utc)
             delta = now - started_at
@@ -157,31 +175,33 @@ class Container(commands.Cog):
 
     async def manage_container(self, ctx, action):
         """Helper method to manage containers interactively using select menus."""
-        if self.client is None:
+        # Determine the status filter based on action
+        try:
+            if action == "start":
+                containers = await self.docker_call(
+                    "list", "docker.list", all=True, filters={"status": "exited"}
+                )
+            else:
+                containers = await self.docker_call("list", "docker.list")
+        except WorkerError as e:
+            log.error(f"Error connecting to Docker: {e}")
             await ctx.send(
                 "❌ Docker client is not available. Please check Docker connection."
             )
             return
 
-        # Determine the status filter based on action
-        if action == "start":
-            containers = self.client.containers.list(
-                all=True, filters={"status": "exited"}
-            )
-        else:
-            containers = self.client.containers.list()
-
         if not containers:
             await ctx.send(f"🛑 No containers available to {action}.")
             return
 
         # Sort containers by name
-        containers.sort(key=lambda x: x.name)
+        containers.sort(key=lambda x: x["name"])
 
         # Create select options
         options = [
             discord.SelectOption(
-                label=f"{container.name} ({container.status})", value=container.name
+                label=f"{container['name']} ({container['status']})",
+                value=container["name"],
             )
             for container in containers
         ]
@@ -190,12 +210,13 @@ class Container(commands.Cog):
         if len(options) > 25:
             options = options[:25]
 
+        docker_call = self.docker_call
+
         # Define the view with a select menu
-        class ContainerSelectView(discord.ui.View):
-            def __init__(self, options, client, action, ctx, timeout=60):
+        class ContainerSelectView(CountedView):
+            def __init__(self, options, action, ctx, timeout=60):
                 super().__init__(timeout=timeout)
                 self.container_name = None
-                self.client = client
                 self.action = action
                 self.ctx = ctx
 
@@ -217,39 +238,30 @@ class Container(commands.Cog):
                     return
                 self.container_name = self.select.values[0]
                 await interaction.response.defer()
-                container = self.client.containers.get(self.container_name)
+                messages = {
+                    "start": "▶️ Container `{}` has been started.",
+                    "stop": "⏹️ Container `{}` has been stopped.",
+                    "restart": "🔄 Container `{}` has been restarted.",
+                    "remove": "🗑️ Container `{}` has been removed.",
+                }
                 try:
-                    if self.action == "start":
-                        container.start()
-                        await interaction.followup.send(
-                            f"▶️ Container `{container.name}` has been started.",
-                            ephemeral=False,
-                        )
-                    elif self.action == "stop":
-                        container.stop()
-                        await interaction.followup.send(
-                            f"⏹️ Container `{container.name}` has been stopped.",
-                            ephemeral=False,
-                        )
-                    elif self.action == "restart":
-                        container.restart()
-                        await interaction.followup.send(
-                            f"🔄 Container `{container.name}` has been restarted.",
-                            ephemeral=False,
-                        )
-                    elif self.action == "remove":
-                        container.remove(force=True)
-                        await interaction.followup.send(
-                            f"🗑️ Container `{container.name}` has been removed.",
-                            ephemeral=False,
-                        )
+                    result = await docker_call(
+                        self.action,
+                        "docker.action",
+                        name=self.container_name,
+                        action=self.action,
+                    )
+                    await interaction.followup.send(
+                        messages[self.action].format(result["name"]),
+                        ephemeral=False,
+                    )
                 except Exception as e:
                     await interaction.followup.send(
                         f"⚠️ An error occurred: {e}", ephemeral=False
                     )
                 self.stop()  # Stop the view after the operation
 
-        view = ContainerSelectView(options, self.client, action, ctx)
+        view = ContainerSelectView(options, action, ctx)
         embed = discord.Embed(
             title=f"Select a container to {action.capitalize()}",
             color=discord.Color.blue(),
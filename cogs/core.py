@@ -1,18 +1,19 @@
-import os
-import json
 import discord
 from discord.ext import commands
 import asyncio
+import logging
+import datetime
+import time
+from typing import Literal, Optional
+from cache_config import SIZE_SAMPLE, cache_report, process_rss
+from cog_config import read_cog_config, save_cog_config
+from cog_registry import PROTECTED_COGS, reload_module
 from decorators import delete_command_message, delete_bot_response
+from metrics import CountedView, format_duration
+from shard_stats import format_latency
+from worker_pool import WorkerPool
 
-# Directory and file for storing cog configurations
-CONFIG_DIR = "./config"
-CONFIG_FILE = os.path.join(
-    CONFIG_DIR, "cogs_config.json"
-)  # Full path to the cogs config file
-
-# List of cogs that should not be manipulated
-PROTECTED_COGS = ["cogs.core", "cogs.help"]
+log = logging.getLogger(__name__)
 
 
 class Core(
@@ -22,60 +23,28 @@ class Core(
 
     def __init__(self, bot):
         self.bot = bot
-        # Ensure the config directory exists
-        os.makedirs(CONFIG_DIR, exist_ok=True)
-        # Load cogs from the config on initialization
-        self.loaded_cogs = self.load_cogs_from_config()
-        # Remove protected cogs from the config if they exist
+        # Load cogs from the config on initialization, excluding protected cogs
         self.loaded_cogs = [
-            cog for cog in self.loaded_cogs if cog not in PROTECTED_COGS
+            cog for cog in read_cog_config() if cog not in PROTECTED_COGS
         ]
 
-    def update_cog_config(self):
+    async def update_cog_config(self):
         """Update the config file with the loaded cogs, excluding protected cogs."""
-        loaded_cogs = [
-            f"cogs.{cog.__class__.__name__.lower()}" for cog in self.bot.cogs.values()
-        ]
-        # Exclude protected cogs
-        loaded_cogs = [cog for cog in loaded_cogs if cog not in PROTECTED_COGS]
-        try:
-            with open(CONFIG_FILE, "w") as f:
-                json.dump({"loaded_cogs": loaded_cogs}, f, indent=4)
-        except Exception as e:
-            print(f"Error writing to config file: {e}")
-
-    def load_cogs_from_config(self):
-        """Load the cogs from the config file, excluding protected cogs."""
+        # Extension names are what load_extension expects; a cog's class name
+        # doesn't have to match the name of its file
+        loaded_cogs = sorted(
+            cog for cog in self.bot.extensions if cog not in PROTECTED_COGS
+        )
         try:
-            with open(CONFIG_FILE, "r") as f:
-                loaded_cogs = json.load(f).get("loaded_cogs", [])
-                # Exclude protected cogs
-                loaded_cogs = [cog for cog in loaded_cogs if cog not in PROTECTED_COGS]
-                return loaded_cogs
-        except FileNotFoundError:
-            # If the config file is missing, create it with an empty list
-            with open(CONFIG_FILE, "w") as f:
-                json.dump({"loaded_cogs": []}, f, indent=4)
-            return []
-        except json.JSONDecodeError as e:
-            print(f"Error reading config file: {e}")
-            return []
+            # Written atomically from a thread so the event loop isn't blocked
+            await save_cog_config(loaded_cogs)
+        except OSError as e:
+            log.error(f"Error writing to config file: {e}")
 
     def get_all_cogs(self):
         """Get a list of all cogs in the cogs folder, excluding protected cogs."""
-        cogs_folder = "./cogs"  # Directory where the cogs are stored
-        cogs = []
-        try:
-            for filename in os.listdir(cogs_folder):
-                if (
-                    filename.endswith(".py") and filename != "__init__.py"
-                ):  # Exclude __init__.py
-                    cog_name = f"cogs.{filename[:-3]}"  # Strip the ".py" extension
-                    if cog_name not in PROTECTED_COGS:
-                        cogs.append(cog_name)
-        except FileNotFoundError:
-            print(f"Cogs folder '{cogs_folder}' not found.")
-        return cogs
+        # The registry only rescans the folder when it has changed
+        return self.bot.cog_registry.extensions()
 
     @commands.command()
     @commands.is_owner()
@@ -100,14 +69,96 @@ class Core(
     @commands.command()
     @commands.is_owner()
     @delete_command_message(delay=0)
-    @delete_bot_response(delay=5)
-    async def reload(self, ctx):
-        """Reload cogs interactively.
+    @delete_bot_response(delay=30)
+    async def reload(self, ctx, mode: Optional[Literal["changed"]] = None):
+        """Reload cogs interactively, or every cog whose code has changed.
+
+        `changed` reloads the cogs whose file, or a helper module they import
+        such as `decorators.py`, changed since they were loaded. Modules that
+        hold the bot's shared state, like `metrics.py`, and the code the
+        workers run only update on a restart.
 
         **Usage:**
         `!reload
+        `!reload changed`
         """
-        await self.manage_cogs(ctx, action="reload")
+        if mode == "changed":
+            await self.reload_changed(ctx)
+        else:
+            await self.manage_cogs(ctx, action="reload")
+
+    async def reload_changed(self, ctx):
+        """Reloads the out of date cogs in parallel and reports them in one embed."""
+        registry = self.bot.cog_registry
+        changes = {}
+        for cog in self.bot.extensions:
+            changed = registry.changed_since_load(cog)
+            if changed:
+                changes[cog] = changed
+
+        if not changes:
+            await ctx.send("✅ No cog has changed since it was loaded.", delete_after=5)
+            return
+
+        lines = []
+        # Reload the changed helper modules first so the cogs import the new code.
+        # A helper is restored if it fails, and the cogs using it are left alone.
+        # Protected cogs aren't reloaded, so neither are helpers only they use
+        failed_helpers = {}
+        reloaded_helpers = set()
+        for cog, changed in changes.items():
+            if cog in PROTECTED_COGS:
+                continue
+            for name in changed:
+                if name == cog or name in failed_helpers or name in reloaded_helpers:
+                    continue
+                try:
+                    reload_module(name)
+                    reloaded_helpers.add(name)
+                except Exception as e:
+                    failed_helpers[name] = e
+                    lines.append(f"❌ `{name}.py`: {e}")
+        if isinstance(self.bot.workers, WorkerPool):
+            for name in sorted(reloaded_helpers & registry.worker_dependencies()):
+                lines.append(
+                    f"⚠️ `{name}.py`: the workers keep the old code, restart the bot to update them"
+                )
+
+        reloadable = []
+        for cog, changed in sorted(changes.items()):
+            failed = [name for name in changed if name in failed_helpers]
+            if cog in PROTECTED_COGS:
+                lines.append(f"⚠️ `{cog[5:]}`: protected, restart the bot to update")
+            elif failed:
+                lines.append(f"❌ `{cog[5:]}`: skipped, `{failed[0]}.py` failed")
+            else:
+                reloadable.append(cog)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(self.timed_cog_action("reload", cog) for cog in reloadable)
+        )
+        elapsed = time.perf_counter() - start
+
+        for cog, error, duration in results:
+            changed = ", ".join(f"`{name.split('.')[-1]}`" for name in changes[cog])
+            if error is None:
+                lines.append(f"✅ `{cog[5:]}` in {duration * 1000:.0f} ms ({changed})")
+            else:
+                # discord.py puts the previous module back if the reload fails
+                lines.append(f"❌ `{cog[5:]}`: {error} (rolled back)")
+
+        reloaded = sum(error is None for _, error, _ in results)
+        failed = any(line.startswith("❌") for line in lines)
+        embed = discord.Embed(
+            title="🔄 Reload Changed Cogs",
+            description="\n".join(lines)[:4096],
+            color=discord.Color.orange() if failed else discord.Color.green(),
+        )
+        embed.set_footer(
+            text=f"{reloaded} of {len(changes)} changed cogs reloaded in {elapsed:.2f}s"
+        )
+        await ctx.send(embed=embed)
 
     async def manage_cogs(self, ctx, action):
         """Helper method to interactively manage cogs using select menus."""
@@ -146,7 +197,7 @@ class Core(
                 description=f"Page {chunk_index + 1} of {len(option_chunks)}",
                 color=discord.Color.blue(),
             )
-            view = discord.ui.View()
+            view = CountedView()
             select = discord.ui.Select(
                 placeholder=f"Select cogs to {action.capitalize()}",
                 options=option_chunk,
@@ -190,30 +241,65 @@ class Core(
                 )
                 return
 
+    async def timed_cog_action(self, action, cog):
+        """Loads, unloads or reloads a cog and returns (cog, error, seconds taken)."""
+        methods = {
+            "load": self.bot.load_extension,
+            "unload": self.bot.unload_extension,
+            "reload": self.bot.reload_extension,
+        }
+        start = time.perf_counter()
+        try:
+            await methods[action](cog)
+        except Exception as e:
+            return cog, e, time.perf_counter() - start
+        if action == "unload":
+            self.bot.cog_registry.forget(cog)
+        else:
+            self.bot.cog_registry.mark_loaded(cog)
+        return cog, None, time.perf_counter() - start
+
     async def perform_cog_action(self, ctx, action, cogs):
-        """Performs the specified action on the list of cogs."""
-        for cog in cogs:
-            try:
-                if action == "load":
-                    await self.bot.load_extension(cog)
-                    await ctx.send(f"✅ Loaded cog: `{cog[5:]}`", delete_after=5)
-                elif action == "unload":
-                    await self.bot.unload_extension(cog)
-                    await ctx.send(f"✅ Unloaded cog: `{cog[5:]}`", delete_after=5)
-                elif action == "reload":
-                    await self.bot.reload_extension(cog)
-                    await ctx.send(f"🔄 Reloaded cog: `{cog[5:]}`", delete_after=5)
-                self.update_cog_config()
-            except commands.ExtensionAlreadyLoaded:
-                await ctx.send(
-                    f"⚠️ The cog `{cog[5:]}` is already loaded.", delete_after=5
-                )
-            except commands.ExtensionNotLoaded:
-                await ctx.send(f"⚠️ The cog `{cog[5:]}` is not loaded.", delete_after=5)
-            except Exception as e:
-                await ctx.send(
-                    f"❌ Error {action}ing cog `{cog[5:]}`: {e}", delete_after=5
-                )
+        """Performs the specified action on the cogs concurrently.
+
+        The outcome for every cog is reported in a single embed.
+        """
+        icons = {"load": "✅", "unload": "✅", "reload": "🔄"}
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(self.timed_cog_action(action, cog) for cog in cogs)
+        )
+        elapsed = time.perf_counter() - start
+
+        lines = []
+        for cog, error, duration in results:
+            timing = f"{duration * 1000:.0f} ms"
+            if error is None:
+                lines.append(f"{icons[action]} `{cog[5:]}` in {timing}")
+            elif isinstance(error, commands.ExtensionAlreadyLoaded):
+                lines.append(f"⚠️ `{cog[5:]}` is already loaded")
+            elif isinstance(error, commands.ExtensionNotLoaded):
+                lines.append(f"⚠️ `{cog[5:]}` is not loaded")
+            else:
+                lines.append(f"❌ Error {action}ing `{cog[5:]}`: {error}")
+
+        succeeded = sum(error is None for _, error, _ in results)
+        embed = discord.Embed(
+            title=f"{icons[action]} {action.capitalize()} Cogs",
+            description="\n".join(lines)[:4096],
+            color=(
+                discord.Color.green()
+                if succeeded == len(results)
+                else discord.Color.orange()
+            ),
+        )
+        embed.set_footer(
+            text=f"{succeeded} of {len(results)} cogs {action}ed in {elapsed:.2f}s"
+        )
+        await ctx.send(embed=embed, delete_after=5)
+
+        # Save the result of the whole action at once
+        await self.update_cog_config()
 
     @commands.command(aliases=["cogs"])
     @delete_command_message(delay=0)
@@ -244,6 +330,206 @@ class Core(
         embed.set_footer(text=f"Total Cogs: {len(all_cogs)}")
         await ctx.send(embed=embed)
 
+    @commands.command(aliases=["cog_stats"])
+    @commands.is_owner()
+    @delete_command_message(delay=0)
+    @delete_bot_response(delay=60)
+    async def cogstats(self, ctx):
+        """Show what each loaded cog costs since it was first loaded.
+
+        Listeners, live tasks the cog started, commands invoked and the time
+        spent in its event handlers and commands. Memory is only shown when
+        the bot runs with `COG_TRACEMALLOC=1`.
+
+        **Usage:**
+        `!cogstats`
+        """
+        stats = self.bot.cog_stats
+        extensions = sorted(self.bot.extensions)
+        memory = await asyncio.to_thread(stats.memory_usage, extensions)
+
+        embed = discord.Embed(title="📊 Cog Stats", color=discord.Color.blue())
+        for extension in extensions[:25]:
+            listeners = sum(
+                len(cog.get_listeners())
+                for cog in self.bot.cogs.values()
+                if type(cog).__module__ == extension
+            )
+            lines = [
+                f"Listeners: {listeners} · Tasks: {stats.live_tasks(extension)}",
+                f"Events: {stats.handler_calls[extension]} in "
+                f"{stats.handler_time[extension]:.2f}s",
+                f"Commands: {stats.commands[extension]} in "
+                f"{stats.command_time[extension]:.2f}s",
+            ]
+            if memory is not None:
+                lines.append(f"Memory: {memory[extension] / 1024:.0f} KiB")
+            embed.add_field(name=extension[5:], value="\n".join(lines), inline=True)
+        if memory is None:
+            embed.set_footer(text="Set COG_TRACEMALLOC=1 to track memory per cog.")
+        await ctx.send(embed=embed)
+
+    @commands.command()
+    @commands.is_owner()
+    @delete_command_message(delay=0)
+    @delete_bot_response(delay=60)
+    async def stats(self, ctx):
+        """Show command latency percentiles and failures since the bot started.
+
+        **Usage:**
+        `!stats`
+        """
+        metrics = self.bot.metrics
+        errors = metrics.counters["command_errors"]
+        cancellations = metrics.counters["command_cancellations"]
+        # Busiest commands first
+        histograms = sorted(
+            metrics.histograms["commands"].items(),
+            key=lambda item: item[1].count,
+            reverse=True,
+        )
+
+        embed = discord.Embed(title="⏱️ Command Stats", color=discord.Color.blue())
+        for name, histogram in histograms[:25]:
+            value = (
+                f"{histogram.count} runs · p50 {format_duration(histogram.quantile(0.5))}"
+                f"\np95 {format_duration(histogram.quantile(0.95))}"
+                f" · p99 {format_duration(histogram.quantile(0.99))}"
+            )
+            if errors[name] or cancellations[name]:
+                value += (
+                    f"\n❌ {errors[name]} errors · 🛑 {cancellations[name]} cancelled"
+                )
+            embed.add_field(name=name, value=value, inline=True)
+
+        # Gateway health per shard, a bot without shards has just shard 0
+        shards = self.bot.shard_stats.summary(self.bot)
+        lines = [
+            f"Shard {shard}: {format_latency(latency)} latency · "
+            f"{rate:.1f} events/s · {reconnects} reconnects"
+            for shard, latency, rate, reconnects in shards[:10]
+        ]
+        if len(shards) > 10:
+            lines.append(f"… and {len(shards) - 10} more shards")
+        if not histograms:
+            lines.append("No commands have run yet.")
+        embed.description = "\n".join(lines)
+
+        uptime = datetime.timedelta(seconds=int(time.time() - metrics.started))
+        embed.set_footer(
+            text=f"Uptime {uptime} · "
+            f"{sum(metrics.counters['view_timeouts'].values())} view timeouts · "
+            f"{sum(metrics.counters['prompt_timeouts'].values())} prompt timeouts · "
+            f"{sum(metrics.counters['coalesced_calls'].values())} fetches saved"
+        )
+        await ctx.send(embed=embed)
+
+    @commands.command()
+    @commands.is_owner()
+    @delete_command_message(delay=0)
+    @delete_bot_response(delay=60)
+    async def stalls(self, ctx, count: int = 10):
+        """Show the code that blocked the event loop the longest since the bot started.
+
+        **Usage:**
+        `!stalls [count]`
+        """
+        detector = self.bot.stall_detector
+        if detector is None:
+            await ctx.send(
+                "🛑 The stall detector is disabled (`STALL_THRESHOLD=0`).",
+                delete_after=10,
+            )
+            return
+
+        stalls = detector.top(max(1, min(count, 25)))
+        embed = discord.Embed(
+            title="🐢 Event Loop Stalls",
+            description=None if stalls else "No stalls detected. 🎉",
+            color=discord.Color.orange() if stalls else discord.Color.green(),
+        )
+        for stall in stalls:
+            embed.add_field(
+                name=stall.site[:256],
+                value=f"{stall.count}× · total {format_duration(stall.total)}"
+                f" · max {format_duration(stall.max)}"
+                f"\nLast: <t:{int(stall.last_seen)}:R>",
+                inline=False,
+            )
+        embed.set_footer(
+            text=f"Stalls longer than {detector.threshold:g}s · full stacks are in the log"
+        )
+        await ctx.send(embed=embed)
+
+    @commands.command(aliases=["mem"])
+    @commands.is_owner()
+    @delete_command_message(delay=0)
+    @delete_bot_response(delay=60)
+    async def memory(self, ctx):
+        """Show the bot's memory usage and what discord.py's caches hold.
+
+        Cache sizes are rough estimates from a sample of their objects, not
+        the resident memory each cache costs. Shrink the caches with
+        `INTENTS`, `MAX_MESSAGES`, `MEMBER_CACHE` and `CHUNK_GUILDS`.
+
+        **Usage:**
+        `!memory`
+        """
+        rss = process_rss()
+        embed = discord.Embed(
+            title="🧠 Memory",
+            description=(
+                f"Resident memory: **{rss / 2**20:.1f} MiB**"
+                if rss is not None
+                else "Resident memory is only known on Linux."
+            )
+            + f"\nCache sizes are estimates from {SIZE_SAMPLE} objects each.",
+            color=discord.Color.blue(),
+        )
+        for name, count, limit, size in cache_report(self.bot):
+            if limit is not None:
+                count = f"{count} / {limit}" if limit else "off"
+            embed.add_field(
+                name=name, value=f"{count} · ~{size / 1024:.0f} KiB", inline=True
+            )
+        state = self.bot._connection
+        member_cache = [name for name, enabled in state.member_cache_flags if enabled]
+        chunking = getattr(state, "_chunk_guilds", False)
+        embed.set_footer(
+            text=f"Member cache: {', '.join(member_cache) or 'off'} · "
+            f"Chunking at startup: {'on' if chunking else 'off'}"
+        )
+        await ctx.send(embed=embed)
+
+    @commands.command()
+    @commands.is_owner()
+    @delete_command_message(delay=0)
+    @delete_bot_response(delay=60)
+    async def tasks(self, ctx, cog: str = None):
+        """Show the background tasks the cogs are running, oldest first.
+
+        **Usage:**
+        `!tasks [cog]`
+        """
+        tracked = self.bot.tasks.live()
+        if cog is not None:
+            # Cogs are named like their modules in the other commands, e.g. msg
+            tracked = [t for t in tracked if t.owner.lower() == cog.lower()]
+        now = time.time()
+        lines = [
+            f"`{t.owner}` {t.name} · {datetime.timedelta(seconds=int(now - t.started))}"
+            for t in tracked
+        ]
+        description = "\n".join(lines) or "No background tasks are running."
+        if len(description) > 4096:
+            description = description[:4000].rsplit("\n", 1)[0] + "\n…"
+        embed = discord.Embed(
+            title=f"🧵 Background Tasks ({len(tracked)})",
+            description=description,
+            color=discord.Color.blue(),
+        )
+        await ctx.send(embed=embed)
+
     async def cog_command_error(self, ctx, error):
         """Handle errors for commands in this cog."""
         if isinstance(error, commands.NotOwner):
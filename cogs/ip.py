@@ -3,8 +3,15 @@ from discord.ext import commands
 from discord import ui
 import asyncio
 import aiohttp
+import functools
 import platform
 from decorators import delete_command_message, delete_bot_response
+from metrics import CountedView
+from shard_stats import format_latency
+
+
+class PublicIPError(Exception):
+    """The public IP couldn't be fetched; the message says why."""
 
 
 class Ip(
@@ -17,23 +24,50 @@ class Ip(
         self.bot = bot
 
     async def get_public_ip(self):
-        """Asynchronously fetches the current public IP."""
+        """Asynchronously fetches the current public IP.
+
+        Raises PublicIPError if it can't, so failures aren't shared as results.
+        """
         async with aiohttp.ClientSession() as session:
             try:
                 async with session.get(
                     "https://api.ipify.org?format=json", timeout=5
                 ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data.get("ip")
-                    else:
-                        return (
+                    if response.status != 200:
+                        raise PublicIPError(
                             f"Error: Received unexpected status code {response.status}"
                         )
+                    data = await response.json()
             except asyncio.TimeoutError:
-                return "Error: Timeout when trying to fetch the public IP."
+                raise PublicIPError(
+                    "Error: Timeout when trying to fetch the public IP."
+                ) from None
             except aiohttp.ClientError as e:
-                return f"Error fetching public IP: {e}"
+                raise PublicIPError(f"Error fetching public IP: {e}") from e
+        if not data.get("ip"):
+            raise PublicIPError("Error: The response didn't contain an IP.")
+        return data["ip"]
+
+    async def get_shared_public_ip(self):
+        """Fetches the public IP once for all `!ip` and `!ipinfo` asking at once.
+
+        Raises PublicIPError if it can't; only successful fetches are shared.
+        """
+        return await self.bot.single_flight.run("public_ip", (), self.get_public_ip)
+
+    async def get_ip_details(self, public_ip):
+        """Fetches geolocation and network details of an IP.
+
+        Returns the HTTP status and the parsed response, None unless it's 200.
+        """
+        async with aiohttp.ClientSession() as session:
+            async with session.get(
+                f"http://ip-api.com/json/{public_ip}?fields=status,message,country,regionName,city,isp,org,as,query",
+                timeout=5,
+            ) as response:
+                if response.status != 200:
+                    return response.status, None
+                return response.status, await response.json()
 
     @commands.command(name="get_ip", aliases=["ip"])
     @commands.is_owner()
@@ -50,11 +84,11 @@ class Ip(
 
         This command fetches and displays the public IP address of the server the bot is running on.
         """
-        public_ip = await self.get_public_ip()
-
-        if public_ip.startswith("Error"):
+        try:
+            public_ip = await self.get_shared_public_ip()
+        except PublicIPError as e:
             # Send an error message
-            await ctx.send(f"❌ {public_ip}", delete_after=10)
+            await ctx.send(f"❌ {e}", delete_after=10)
         else:
             # Send the public IP address
             embed = discord.Embed(
@@ -83,82 +117,73 @@ class Ip(
 
         This command fetches and displays detailed geolocation and network information about the server's public IP address.
         """
-        public_ip = await self.get_public_ip()
-
-        if public_ip.startswith("Error"):
-            await ctx.send(f"❌ {public_ip}", delete_after=10)
+        try:
+            public_ip = await self.get_shared_public_ip()
+        except PublicIPError as e:
+            await ctx.send(f"❌ {e}", delete_after=10)
             return
 
         # Fetch detailed IP information
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(
-                    f"http://ip-api.com/json/{public_ip}?fields=status,message,country,regionName,city,isp,org,as,query",
-                    timeout=5,
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data.get("status") == "success":
-                            embed = discord.Embed(
-                                title="🌐 Server Public IP Information",
-                                color=discord.Color.blue(),
-                            )
-                            embed.add_field(
-                                name="IP Address",
-                                value=f"`{data.get('query')}`",
-                                inline=False,
-                            )
-                            embed.add_field(
-                                name="Country",
-                                value=data.get("country", "N/A"),
-                                inline=True,
-                            )
-                            embed.add_field(
-                                name="Region",
-                                value=data.get("regionName", "N/A"),
-                                inline=True,
-                            )
-                            embed.add_field(
-                                name="City", value=data.get("city", "N/A"), inline=True
-                            )
-                            embed.add_field(
-                                name="ISP", value=data.get("isp", "N/A"), inline=False
-                            )
-                            embed.add_field(
-                                name="Organization",
-                                value=data.get("org", "N/A"),
-                                inline=False,
-                            )
-                            embed.add_field(
-                                name="ASN", value=data.get("as", "N/A"), inline=False
-                            )
-                            embed.set_footer(
-                                text=f"Requested by {ctx.author.display_name}",
-                                icon_url=ctx.author.display_avatar.url,
-                            )
-                            await ctx.send(embed=embed)
-                        else:
-                            error_message = data.get(
-                                "message", "Unknown error occurred."
-                            )
-                            await ctx.send(
-                                f"❌ Error fetching IP information: {error_message}",
-                                delete_after=10,
-                            )
-                    else:
-                        await ctx.send(
-                            f"❌ Error: Received unexpected status code {response.status} when fetching IP information.",
-                            delete_after=10,
-                        )
-            except asyncio.TimeoutError:
-                await ctx.send(
-                    "❌ Error: Timeout when trying to fetch IP information.",
-                    delete_after=10,
-                )
-            except aiohttp.ClientError as e:
-                await ctx.send(
-                    f"❌ Error fetching IP information: {e}", delete_after=10
-                )
+        try:
+            status, data = await self.bot.single_flight.run(
+                "ip_info",
+                (public_ip,),
+                functools.partial(self.get_ip_details, public_ip),
+            )
+        except asyncio.TimeoutError:
+            await ctx.send(
+                "❌ Error: Timeout when trying to fetch IP information.",
+                delete_after=10,
+            )
+            return
+        except aiohttp.ClientError as e:
+            await ctx.send(f"❌ Error fetching IP information: {e}", delete_after=10)
+            return
+
+        if status != 200:
+            await ctx.send(
+                f"❌ Error: Received unexpected status code {status} when fetching IP information.",
+                delete_after=10,
+            )
+        elif data.get("status") == "success":
+            embed = discord.Embed(
+                title="🌐 Server Public IP Information",
+                color=discord.Color.blue(),
+            )
+            embed.add_field(
+                name="IP Address",
+                value=f"`{data.get('query')}`",
+                inline=False,
+            )
+            embed.add_field(
+                name="Country",
+                value=data.get("country", "N/A"),
+                inline=True,
+            )
+            embed.add_field(
+                name="Region",
+                value=data.get("regionName", "N/A"),
+                inline=True,
+            )
+            embed.add_field(name="City", value=data.get("city", "N/A"), inline=True)
+            embed.add_field(name="ISP", value=data.get("isp", "N/A"), inline=False)
+            embed.add_field(
+                name="Organization",
+                value=data.get("org", "N/A"),
+                inline=False,
+            )
+            embed.add_field(name="ASN", value=data.get("as", "N/A"), inline=False)
+            embed.set_footer(
+                text=f"Requested by {ctx.author.display_name}",
+                icon_url=ctx.author.display_avatar.url,
+            )
+            await ctx.send(embed=embed)
+        else:
+            error_message = data.get("message", "Unknown error occurred.")
+            await ctx.send(
+                f"❌ Error fetching IP information: {error_message}",
+                delete_after=10,
+            )
 
     @commands.command(name="ping")
     @commands.has_permissions(send_messages=True)
@@ -172,7 +197,7 @@ class Ip(
         After invoking the command, you'll be presented with options to view bot latency, ping a website, or view system information.
         """
 
-        class PingOptionsView(ui.View):
+        class PingOptionsView(CountedView):
             def __init__(self, bot, ctx, timeout=60):
                 super().__init__(timeout=timeout)
                 self.bot = bot
@@ -183,9 +208,23 @@ class Ip(
             async def bot_latency(
                 self, interaction: discord.Interaction, button: ui.Button
             ):
-                latency = round(self.bot.latency * 1000)  # Convert to milliseconds
                 embed = discord.Embed(title="🏓 Pong!", color=discord.Color.green())
-                embed.add_field(name="Bot Latency", value=f"{latency} ms")
+                embed.add_field(
+                    name="Bot Latency", value=format_latency(self.bot.latency)
+                )
+                shards = self.bot.shard_stats.summary(self.bot)
+                if len(shards) > 1 and self.ctx.guild:
+                    embed.add_field(
+                        name="Shard",
+                        value=f"{self.ctx.guild.shard_id} of {len(shards)}",
+                    )
+                for shard, shard_latency, rate, reconnects in shards[:20]:
+                    embed.add_field(
+                        name=f"Shard {shard}",
+                        value=f"{format_latency(shard_latency)} · "
+                        f"{rate:.1f} events/s · {reconnects} reconnects",
+                        inline=False,
+                    )
                 embed.set_footer(
                     text=f"Requested by {self.ctx.author}",
                     icon_url=self.ctx.author.avatar.url,
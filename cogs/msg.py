@@ -2,25 +2,98 @@ import discord
 from discord.ext import commands
 from discord import ui
 import asyncio
+import logging
 import datetime
-from typing import List
+import re
+from re import _parser as sre_parser
+import regex
+import time
+from collections import Counter, OrderedDict
+from typing import List, Literal, Optional, Union
 from decorators import delete_command_message, delete_bot_response
+from metrics import CountedView
+from attachment_mirror import AttachmentMirror
+from exporter import ChannelExport, serialize_message
+from search_index import SearchIndex
+from worker_pool import WorkerError
 import os
 import pytz
+import aiohttp
+
+log = logging.getLogger(__name__)
 
 # Read the TIMEZONE from environment variable or default to 'Europe/Berlin'
 TIMEZONE = os.getenv("TIMEZONE", "Europe/Berlin")
 user_tz = pytz.timezone(TIMEZONE)
 
+# Number of channels purged in parallel by the server-wide purge
+GUILD_PURGE_WORKERS = 4
+
+# Messages purge_user searches back at most for the selected user's messages
+PURGE_USER_DEPTH = 5000
+
+# Messages purge_contains searches when flags are given without --depth
+PURGE_CONTAINS_DEPTH = 10000
+
+# Longest regex purge_contains accepts
+MAX_PATTERN_LENGTH = 200
+
+# Seconds a filter may spend matching one message before the purge is aborted
+MATCH_TIMEOUT = 0.1
+
+# Number of concurrent sends when broadcasting. discord.py still queues each
+# request on its channel's rate-limit bucket; this only keeps bursts well
+# below the global request limit.
+BROADCAST_CONCURRENCY = 10
+
+# Number of messages written per export batch (and checkpoint)
+EXPORT_BATCH_SIZE = 1000
+
+
+async def broadcast(channels, content, concurrency=BROADCAST_CONCURRENCY):
+    """Sends the same message to several channels concurrently.
+
+    Returns a tuple of (sent channels, [(channel, error)], elapsed seconds).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    sent = []
+    failed = []
+
+    async def send(channel):
+        async with semaphore:
+            try:
+                await channel.send(content)
+                sent.append(channel)
+            except discord.Forbidden:
+                failed.append((channel, "Missing permissions"))
+            except discord.HTTPException as e:
+                failed.append((channel, str(e)))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send(channel) for channel in channels))
+    return sent, failed, time.perf_counter() - start
+
 
 class ScheduledMessage:
 
     _id_counter = 1  # Class variable for assigning unique IDs
 
-    def __init__(self, author_id, channel_id, schedule_time, content):
-        self.id = ScheduledMessage._id_counter
-        ScheduledMessage._id_counter += 1
+    def __init__(
+        self,
+        author_id,
+        channel_id,
+        schedule_time,
+        content,
+        guild_id=None,
+        message_id=None,
+    ):
+        if message_id is None:
+            message_id = ScheduledMessage._id_counter
+        # Restored messages keep their ID, new ones must not reuse it
+        ScheduledMessage._id_counter = max(ScheduledMessage._id_counter, message_id + 1)
+        self.id = message_id
 
+        self.guild_id = guild_id
         self.author_id = author_id
         self.channel_id = channel_id
         self.schedule_time = schedule_time
@@ -29,17 +102,239 @@ class ScheduledMessage:
         self.task = None  # Will hold the asyncio task
 
 
+class RecentAuthors:
+    """Bounded LRU of channels, each remembering its most recent distinct authors."""
+
+    def __init__(self, max_channels=1000, authors_per_channel=25):
+        self.max_channels = max_channels
+        self.authors_per_channel = authors_per_channel  # Matches the select menu limit
+        self._channels = OrderedDict()  # channel_id -> OrderedDict(author_id -> name)
+        self._seeded = set()  # Channels whose recent history was read once
+
+    def record(self, channel_id, author_id, display_name):
+        """Marks an author as the most recent one in a channel."""
+        authors = self._channels.get(channel_id)
+        if authors is None:
+            authors = self._channels[channel_id] = OrderedDict()
+            # Forget the least recently active channel once the LRU is full
+            if len(self._channels) > self.max_channels:
+                evicted, _ = self._channels.popitem(last=False)
+                self._seeded.discard(evicted)
+        else:
+            self._channels.move_to_end(channel_id)
+
+        authors[author_id] = display_name
+        authors.move_to_end(author_id)
+        if len(authors) > self.authors_per_channel:
+            authors.popitem(last=False)
+
+    def get(self, channel_id):
+        """Returns (author_id, display_name) pairs, most recent first."""
+        authors = self._channels.get(channel_id)
+        if not authors:
+            return []
+        return list(reversed(authors.items()))
+
+    def is_seeded(self, channel_id):
+        """Whether the channel's history from before startup was read already.
+
+        Live messages alone don't count: the channel is indexed as soon as
+        anyone, including the one invoking purge_user, speaks in it.
+        """
+        return channel_id in self._seeded
+
+    def mark_seeded(self, channel_id):
+        if channel_id in self._channels:
+            self._seeded.add(channel_id)
+
+
+class SlowPatternError(Exception):
+    """A filter took longer than MATCH_TIMEOUT to match a message."""
+
+
+def find_nested_repeat(subpattern, repeated=False):
+    """Checks a parsed regex for a repeat inside another repeat.
+
+    Patterns like `(a+)+` or `(a{1,5})+` backtrack exponentially on input
+    that almost matches, so they are turned down before any message is
+    scanned. Possessive repeats don't backtrack and are allowed. Other slow
+    patterns, e.g. `(a|aa)*b`, are caught by the match timeout instead.
+    """
+    for op, av in subpattern:
+        if op in (sre_parser.MAX_REPEAT, sre_parser.MIN_REPEAT):
+            low, high, body = av
+            if high > 1 and repeated:
+                return True
+            if find_nested_repeat(body, repeated or high > 1):
+                return True
+            continue
+        # Groups, alternatives and lookarounds hold their parts in av
+        children = list(av) if isinstance(av, (tuple, list)) else [av]
+        while children:
+            child = children.pop()
+            if isinstance(child, sre_parser.SubPattern):
+                if find_nested_repeat(child, repeated):
+                    return True
+            elif isinstance(child, (tuple, list)):
+                children.extend(child)
+    return False
+
+
+def check_pattern(pattern):
+    """Rejects user-supplied regexes that are too long or could backtrack
+    catastrophically; raises re.error like an invalid pattern would."""
+    if len(pattern) > MAX_PATTERN_LENGTH:
+        raise re.error(f"pattern is longer than {MAX_PATTERN_LENGTH} characters")
+    if find_nested_repeat(sre_parser.parse(pattern)):
+        raise re.error(
+            "nested repeats like `(a+)+` are too slow, use a simpler pattern"
+        )
+
+
+class MessageFilter:
+    """Keyword, regex, author and attachment filters compiled into one matcher.
+
+    All keywords and regexes are folded into a single case-insensitive
+    alternation, so each message is scanned once no matter how many
+    patterns were given. Matching runs on the event loop, so every scan is
+    limited to MATCH_TIMEOUT seconds; `matches` raises SlowPatternError
+    rather than blocking the bot on a pattern that backtracks.
+    """
+
+    def __init__(self, keywords=(), patterns=(), author_ids=(), has_attachments=None):
+        self.keywords = [keyword for keyword in keywords if keyword]
+        self.patterns = [pattern for pattern in patterns if pattern]
+        for pattern in self.patterns:
+            check_pattern(pattern)
+        alternatives = [re.escape(keyword) for keyword in self.keywords] + [
+            f"(?:{pattern})" for pattern in self.patterns
+        ]
+        # Raises regex.error for invalid user-supplied patterns. The regex
+        # module, unlike re, can stop a search that runs too long
+        self.regex = (
+            regex.compile("|".join(alternatives), regex.IGNORECASE)
+            if alternatives
+            else None
+        )
+        self.author_ids = frozenset(author_ids)
+        self.has_attachments = has_attachments
+
+    def __bool__(self):
+        """A filter without any criteria would match every message."""
+        return bool(self.regex or self.author_ids or self.has_attachments is not None)
+
+    def matches(self, message):
+        """Checks a message against all criteria, cheapest first."""
+        if self.author_ids and message.author.id not in self.author_ids:
+            return False
+        if (
+            self.has_attachments is not None
+            and bool(message.attachments) != self.has_attachments
+        ):
+            return False
+        if self.regex is not None:
+            try:
+                found = self.regex.search(message.content, timeout=MATCH_TIMEOUT)
+            except TimeoutError:
+                raise SlowPatternError(
+                    f"matching a message took more than {MATCH_TIMEOUT}s"
+                ) from None
+            if not found:
+                return False
+        return True
+
+    def describe(self):
+        """Returns a short human readable summary of the criteria."""
+        parts = [f"`{keyword}`" for keyword in self.keywords]
+        parts += [f"regex `{pattern}`" for pattern in self.patterns]
+        if self.author_ids:
+            parts.append(
+                "from " + ", ".join(f"<@{author_id}>" for author_id in self.author_ids)
+            )
+        if self.has_attachments is not None:
+            parts.append(
+                "with attachments" if self.has_attachments else "without attachments"
+            )
+        return ", ".join(parts)
+
+
+class PurgeFilterFlags(commands.FlagConverter, prefix="--", delimiter=" "):
+    """Flags accepted by `purge_contains`."""
+
+    keyword: List[str] = commands.flag(default=lambda ctx: [])
+    regex: List[str] = commands.flag(default=lambda ctx: [])
+    author: List[discord.User] = commands.flag(default=lambda ctx: [])
+    attachments: Optional[bool] = None
+    depth: Optional[int] = None
+    dry_run: bool = False
+
+
 class Msg(
     commands.Cog,
     description="Commands for managing messages, including purging, saving, pinning, and scheduling.",
 ):
     def __init__(self, bot):
         self.bot = bot
-        self.archive_channel = None  # archive chnanel object
+        self.config = bot.config_store  # Per-guild settings
         self.sticky_messages = {}  # Dictionary of syicky messages per channel
+        self.sticky_tasks = {}  # Tasks reposting the sticky message per channel
         self.scheduled_messages: List[ScheduledMessage] = (
             []
         )  # List to store scheduled messages
+        self.recent_authors = RecentAuthors()  # Recent authors per channel
+        self.active_exports = set()  # IDs of channels currently being exported
+        self.search_index = SearchIndex()  # Full-text index of saved messages
+        self.attachment_mirror = AttachmentMirror(
+            workers=bot.workers
+        )  # Local copies of attachments
+
+    async def cog_load(self):
+        await asyncio.to_thread(self.attachment_mirror.load)
+        self.bot.metrics.register_gauge(
+            "scheduled_messages",
+            "Messages waiting to be sent by !schedule_msg.",
+            lambda: len(self.scheduled_messages),
+        )
+        self.bot.metrics.register_gauge(
+            "sticky_messages",
+            "Channels with an active sticky message.",
+            lambda: len(self.sticky_tasks),
+        )
+        # When reloaded while connected there won't be another on_ready
+        if self.bot.is_ready():
+            self.restore_stickies()
+            self.restore_scheduled()
+
+    async def cog_unload(self):
+        self.bot.metrics.unregister_gauge("scheduled_messages")
+        self.bot.metrics.unregister_gauge("sticky_messages")
+        # The sticky and scheduled message tasks are cancelled by the task
+        # registry; both are saved, the next load picks them up again. The
+        # bot has already cancelled this cog's running commands, so nothing
+        # uses the index or the mirror anymore
+        self.search_index.close()
+        await self.attachment_mirror.close()
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        self.restore_stickies()
+        self.restore_scheduled()
+
+    @commands.Cog.listener()
+    async def on_guild_available(self, guild):
+        # Guilds that were unavailable at startup, or whose shard connected
+        # after the others, weren't in the cache when on_ready restored
+        if self.bot.is_ready():
+            self.restore_stickies(guild.id)
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        """Keeps the recent-author index up to date."""
+        if message.guild is None or message.author == self.bot.user:
+            return
+        self.recent_authors.record(
+            message.channel.id, message.author.id, message.author.display_name
+        )
 
     # --------------------------------------
     # Archive commands
@@ -64,27 +359,41 @@ class Msg(
             )
             return
 
-        self.archive_channel = channel
+        self.config.set(ctx.guild.id, "archive_channel_id", channel.id)
         await ctx.send(f"✅ Archive channel set to {channel.mention}", delete_after=10)
 
     @commands.command(name="save_msg", aliases=["archive_msg"])
     @commands.has_permissions(manage_messages=True)
     @delete_command_message(delay=0)
     @delete_bot_response(delay=10)
-    async def save_message(self, ctx, message_id: int = None):
-        """Saves a message by its ID to the configured archive channel.
+    async def save_message(
+        self,
+        ctx,
+        mode: Optional[Literal["after", "thread"]] = None,
+        first: Union[discord.Thread, int] = None,
+        last: int = None,
+    ):
+        """Saves messages to the configured archive channel.
 
         **Usage:**
-        `!save_message <message_id>`
+        `!save_message <message_id>` - Saves a single message.
+        `!save_message <first_id> <last_id>` - Saves all messages between two messages.
+        `!save_message after <message_id>` - Saves all messages after a message.
+        `!save_message thread <thread>` - Saves a whole thread.
 
         **Example:**
         `!save_message 123456789012345678`
+        `!save_message 123456789012345678 123456789012345999`
+        `!save_message thread #bug-discussion`
+
+        Up to 10 messages are packed into each archive post and attachments are re-uploaded.
         """
-        if message_id is None:
+        if first is None:
             await ctx.send("❌ Please provide a message ID to save.", delete_after=10)
             return
 
-        if not self.archive_channel:
+        archive_channel = self.get_archive_channel(ctx.guild)
+        if not archive_channel:
             await ctx.send(
                 "❌ Archive channel is not set. Use `!set_archive_channel <channel>`.",
                 delete_after=10,
@@ -92,35 +401,49 @@ class Msg(
             return
 
         try:
-            # Fetch the message from the current channel
-            message = await ctx.channel.fetch_message(message_id)
-
-            # Create an embed to represent the saved message
-            embed = discord.Embed(
-                description=message.content or "[No Text Content]",
-                timestamp=message.created_at,
-                color=discord.Color.blue(),
-            )
-            embed.set_author(
-                name=message.author.display_name,
-                icon_url=message.author.display_avatar.url,
-            )
-            embed.set_footer(text=f"Saved from #{ctx.channel.name}")
-
-            # Include attachments if any
-            if message.attachments:
-                embed.add_field(
-                    name="Attachments",
-                    value="\n".join(
-                        attachment.url for attachment in message.attachments
-                    ),
-                    inline=False,
+            if isinstance(first, discord.Thread) or mode == "thread":
+                if not isinstance(first, discord.Thread):
+                    first = await self.resolve_thread(ctx.guild, first)
+                if first is None or first.guild.id != ctx.guild.id:
+                    await ctx.send(
+                        "❌ That is not a thread in this server.", delete_after=10
+                    )
+                    return
+                if not first.permissions_for(ctx.author).read_message_history:
+                    await ctx.send(
+                        "❌ You don't have permission to read that thread.",
+                        delete_after=10,
+                    )
+                    return
+                source = first
+                messages = first.history(limit=None, oldest_first=True)
+            elif mode == "after":
+                source = ctx.channel
+                messages = ctx.channel.history(
+                    limit=None, after=discord.Object(first), oldest_first=True
+                )
+            elif last is not None:
+                first, last = sorted((first, last))
+                source = ctx.channel
+                # Widen the bounds by one so both given messages are included
+                messages = ctx.channel.history(
+                    limit=None,
+                    after=discord.Object(first - 1),
+                    before=discord.Object(last + 1),
+                    oldest_first=True,
                 )
+            else:
+                source = ctx.channel
+                messages = [await ctx.channel.fetch_message(first)]
 
-            # Send the embed to the archive channel
-            await self.archive_channel.send(embed=embed)
+            saved, posts = await self.archive_messages(
+                messages, source, archive_channel
+            )
+            if saved == 0:
+                await ctx.send("ℹ️ No messages found to save.", delete_after=10)
+                return
             await ctx.send(
-                f"📌 Message saved to {self.archive_channel.mention}.",
+                f"📌 Saved {saved} message{'s' if saved != 1 else ''} in {posts} post{'s' if posts != 1 else ''} to {archive_channel.mention}.",
                 delete_after=10,
             )
         except discord.NotFound:
@@ -136,6 +459,342 @@ class Msg(
         except discord.HTTPException as e:
             await ctx.send(f"❌ An error occurred: {e}", delete_after=10)
 
+    async def resolve_thread(self, guild, thread_id):
+        """Returns the thread of this guild with the given ID, or None."""
+        channel = guild.get_channel_or_thread(thread_id)
+        if channel is None:
+            try:
+                # Archived threads aren't cached
+                channel = await guild.fetch_channel(thread_id)
+            except (discord.NotFound, discord.InvalidData):
+                # InvalidData: the channel belongs to another guild
+                return None
+        return channel if isinstance(channel, discord.Thread) else None
+
+    def get_archive_channel(self, guild):
+        """Returns the guild's archive channel, if one is set and still exists."""
+        channel_id = self.config.get(guild.id, "archive_channel_id")
+        return guild.get_channel(channel_id) if channel_id else None
+
+    def build_archive_embed(self, message, source):
+        """Creates an embed representing a saved message."""
+        embed = discord.Embed(
+            description=message.content or "[No Text Content]",
+            timestamp=message.created_at,
+            color=discord.Color.blue(),
+        )
+        embed.set_author(
+            name=message.author.display_name,
+            icon_url=message.author.display_avatar.url,
+        )
+        embed.set_footer(text=f"Saved from #{source.name}")
+
+        # Include attachments if any
+        if message.attachments:
+            embed.add_field(
+                name="Attachments",
+                value=self.truncate_lines(
+                    [attachment.url for attachment in message.attachments]
+                ),
+                inline=False,
+            )
+        return embed
+
+    async def archive_messages(self, messages, source, archive_channel):
+        """Packs messages into as few archive posts as Discord allows.
+
+        Each post holds up to 10 embeds totalling at most 6000 characters and up
+        to 10 re-uploaded attachments within the server's upload limit.
+        Attachments are downloaded into the local mirror as soon as their
+        message is read, so downloads overlap with reading history and sending
+        earlier posts, and are uploaded from there.
+        Returns the number of saved messages and posts.
+        """
+        size_limit = archive_channel.guild.filesize_limit
+
+        async def download(attachment):
+            try:
+                digest = await self.attachment_mirror.mirror(attachment.url)
+            except (
+                aiohttp.ClientError,
+                asyncio.TimeoutError,
+                OSError,
+                WorkerError,
+            ) as e:
+                log.warning(f"Failed to mirror attachment {attachment.url}: {e}")
+                return None
+            return discord.File(
+                self.attachment_mirror.path_for(digest), filename=attachment.filename
+            )
+
+        embeds = []
+        downloads = []
+        records = []  # Saved messages to add to the search index
+        characters = 0
+        upload_size = 0
+        saved = 0
+        posts = 0
+
+        async def flush():
+            nonlocal embeds, downloads, records, characters, upload_size, posts
+            files = [file for file in await asyncio.gather(*downloads) if file]
+            await archive_channel.send(embeds=embeds, files=files)
+            await asyncio.to_thread(self.search_index.add, records)
+            posts += 1
+            embeds, downloads, records, characters, upload_size = [], [], [], 0, 0
+
+        async def iterate():
+            # Accept both async iterators (history) and plain lists
+            if isinstance(messages, list):
+                for message in messages:
+                    yield message
+            else:
+                async for message in messages:
+                    yield message
+
+        try:
+            async for message in iterate():
+                embed = self.build_archive_embed(message, source)
+                # Attachments beyond the upload limit stay as links in the embed only
+                attachments = []
+                attachments_size = 0
+                for attachment in message.attachments:
+                    if attachments_size + attachment.size <= size_limit:
+                        attachments.append(attachment)
+                        attachments_size += attachment.size
+
+                if embeds and (
+                    len(embeds) == 10
+                    or characters + len(embed) > 6000
+                    or len(downloads) + len(attachments) > 10
+                    or upload_size + attachments_size > size_limit
+                ):
+                    await flush()
+
+                embeds.append(embed)
+                records.append(serialize_message(message))
+                characters += len(embed)
+                upload_size += attachments_size
+                downloads.extend(
+                    asyncio.create_task(download(attachment))
+                    for attachment in attachments
+                )
+                saved += 1
+
+            if embeds:
+                await flush()
+        finally:
+            # Don't leave downloads running if sending a post failed
+            for task in downloads:
+                task.cancel()
+        return saved, posts
+
+    async def write_export_batch(self, export, batch):
+        """Writes a batch of an export in a worker (or a thread without workers)
+        and takes over the checkpoint it returns."""
+        checkpoint = await self.bot.workers.run(
+            "export.write_batch", channel_id=export.channel_id, records=batch
+        )
+        export.last_message_id = checkpoint["last_message_id"]
+        export.count = checkpoint["count"]
+        export.offset = checkpoint["offset"]
+
+    @commands.command(name="export_channel", aliases=["export"])
+    @commands.has_permissions(manage_messages=True)
+    @delete_command_message(delay=0)
+    async def export_channel(self, ctx, channel: discord.TextChannel = None):
+        """Exports a channel's full history to a compressed NDJSON file.
+
+        **Usage:**
+        `!export_channel [channel]`
+
+        **Example:**
+        `!export_channel #general`
+
+        Exports are written to `config/exports` and checkpointed as they go. Running the
+        command again resumes an interrupted export or adds messages sent since the last one.
+        """
+        target_channel = channel or ctx.channel
+
+        # manage_messages is only checked where the command runs
+        if not target_channel.permissions_for(ctx.author).read_message_history:
+            await ctx.send(
+                f"❌ You don't have permission to read {target_channel.mention}.",
+                delete_after=10,
+            )
+            return
+        if not target_channel.permissions_for(ctx.guild.me).read_message_history:
+            await ctx.send(
+                f"❌ I don't have permission to read {target_channel.mention}.",
+                delete_after=10,
+            )
+            return
+
+        if target_channel.id in self.active_exports:
+            await ctx.send(
+                f"⚠️ {target_channel.mention} is already being exported.",
+                delete_after=10,
+            )
+            return
+
+        self.active_exports.add(target_channel.id)
+        export = ChannelExport(target_channel.id)
+        status_message = await ctx.send(f"🔄 Exporting {target_channel.mention}...")
+        batch = []
+        writing = False
+        try:
+            await asyncio.to_thread(export.load_checkpoint)
+            resumed_from = export.count
+            after = (
+                discord.Object(export.last_message_id)
+                if export.last_message_id
+                else None
+            )
+
+            batches = 0
+            async for message in target_channel.history(
+                limit=None, after=after, oldest_first=True
+            ):
+                batch.append(serialize_message(message))
+                if len(batch) == EXPORT_BATCH_SIZE:
+                    # Compress and write off the event loop
+                    writing = True
+                    await self.write_export_batch(export, batch)
+                    # Written and checkpointed, a cancel from here on must not
+                    # write it again
+                    written, batch, writing = batch, [], False
+                    await asyncio.to_thread(self.search_index.add, written)
+                    batches += 1
+                    if batches % 10 == 0:
+                        await status_message.edit(
+                            content=f"🔄 Exporting {target_channel.mention}... {export.count} messages written."
+                        )
+            writing = True
+            await self.write_export_batch(export, batch)
+            written, batch, writing = batch, [], False
+            await asyncio.to_thread(self.search_index.add, written)
+
+            if export.count == 0:
+                # Nothing was ever written, so there is no file to upload
+                await status_message.edit(
+                    content=f"ℹ️ {target_channel.mention} has no messages to export."
+                )
+                return
+
+            summary = (
+                f"✅ Exported {export.count - resumed_from} new messages from {target_channel.mention} "
+                f"({export.count} total, {export.size() / 1024 / 1024:.1f} MB)."
+            )
+            if export.size() <= ctx.guild.filesize_limit:
+                await status_message.edit(content=summary)
+                await ctx.send(
+                    file=discord.File(
+                        export.path, filename=f"{target_channel.name}.ndjson.gz"
+                    )
+                )
+            else:
+                await status_message.edit(
+                    content=f"{summary}\nThe file is too large to upload and was kept at `{export.path}`."
+                )
+        except discord.Forbidden:
+            await status_message.edit(
+                content="❌ I don't have permission to read that channel's history."
+            )
+        except discord.HTTPException as e:
+            await status_message.edit(
+                content=f"❌ Export interrupted after {export.count} messages: {e}. Run the command again to resume."
+            )
+        except (OSError, WorkerError) as e:
+            await status_message.edit(content=f"❌ Failed to write the export: {e}")
+        except asyncio.CancelledError:
+            # The bot is shutting down. Checkpoint what was fetched since the
+            # last batch so the next run resumes from there; a batch that was
+            # being written either finishes and checkpoints itself or is
+            # truncated away on resume
+            if batch and not writing:
+                export.write_batch(batch)
+            raise
+        finally:
+            self.active_exports.discard(target_channel.id)
+
+    @commands.command(name="search_msgs", aliases=["search"])
+    @commands.guild_only()
+    @commands.has_permissions(manage_messages=True)
+    @delete_command_message(delay=0)
+    @delete_bot_response(delay=60)
+    async def search_messages(self, ctx, *, query: str = None):
+        """Searches archived and exported messages of this server.
+
+        **Usage:**
+        `!search_msgs <words>`
+
+        **Example:**
+        `!search_msgs deployment rollback`
+
+        Only messages saved with `save_msg` or exported with `export_channel` are searchable,
+        and only from channels you can read.
+        """
+        if not query:
+            await ctx.send(
+                "❌ Please provide something to search for.", delete_after=10
+            )
+            return
+
+        # Archives and exports hold private channels too, only search the ones
+        # the invoker can read
+        readable = [
+            channel.id
+            for channel in [*ctx.guild.channels, *ctx.guild.threads]
+            if channel.permissions_for(ctx.author).read_messages
+        ]
+        start = time.perf_counter()
+        results = await asyncio.to_thread(
+            self.search_index.search, ctx.guild.id, query, readable
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+
+        if not results:
+            await ctx.send(f"🔍 No messages found for `{query}`.", delete_after=10)
+            return
+
+        embed = discord.Embed(
+            title=f"🔍 Results for {query}"[:256], color=discord.Color.blue()
+        )
+        lines = [
+            f"[Jump]({result['url']}) **{result['author']}** · {result['created_at'][:10]}\n{result['snippet']}"
+            for result in results
+        ]
+        embed.description = self.truncate_lines(lines, limit=4096)
+        embed.set_footer(text=f"{len(results)} results in {elapsed:.1f} ms")
+        await ctx.send(embed=embed)
+
+    @commands.command(name="mirror_stats")
+    @commands.has_permissions(manage_messages=True)
+    @delete_command_message(delay=0)
+    @delete_bot_response(delay=30)
+    async def mirror_stats(self, ctx):
+        """Shows disk usage and deduplication savings of the attachment mirror.
+
+        **Usage:**
+        `!mirror_stats`
+        """
+        mirror = self.attachment_mirror
+        stats = mirror.stats
+        embed = discord.Embed(title="🗄️ Attachment Mirror", color=discord.Color.blue())
+        embed.add_field(name="Files", value=str(len(mirror.entries)))
+        embed.add_field(
+            name="Disk Usage",
+            value=f"{mirror.total_size / 1024 / 1024:.1f} / {mirror.quota / 1024 / 1024:.0f} MB",
+        )
+        embed.add_field(name="Downloads", value=str(stats["downloads"]))
+        embed.add_field(name="Duplicates", value=str(stats["dedup_hits"]))
+        embed.add_field(
+            name="Saved by Dedup",
+            value=f"{stats['bytes_saved'] / 1024 / 1024:.1f} MB",
+        )
+        embed.add_field(name="Evicted", value=str(stats["evicted"]))
+        await ctx.send(embed=embed)
+
     @commands.command(name="pin_msg", aliases=["pin"])
     @commands.has_permissions(manage_messages=True)
     @delete_command_message(delay=0)
@@ -191,6 +850,8 @@ class Msg(
 
         **Example:**
         `!sticky_message 123456789012345678`
+
+        Sticky messages are remembered and restored when the bot restarts.
         """
         if message_id is None:
             await ctx.send(
@@ -202,7 +863,7 @@ class Msg(
         channel = ctx.channel
 
         # Check if there's already a sticky message in this channel
-        if channel.id in self.sticky_messages:
+        if channel.id in self.sticky_tasks:
             await ctx.send(
                 "⚠️ A sticky message is already active in this channel. Use `!stop_sticky` to stop it first.",
                 delete_after=10,
@@ -227,21 +888,66 @@ class Msg(
             await ctx.send(f"❌ An error occurred: {e}", delete_after=10)
             return
 
-        # Send the initial sticky message
+        definition = {
+            "content": original_message.content,
+            "embeds": [embed.to_dict() for embed in original_message.embeds],
+            "message_id": None,  # ID of the currently posted copy
+        }
+        self.save_sticky(ctx.guild.id, channel.id, definition)
+        self.start_sticky(channel, definition)
+
+    def save_sticky(self, guild_id, channel_id, definition):
+        """Stores a channel's sticky definition in the guild settings."""
+        # Copy so the cached settings are only changed through the store
+        stickies = dict(self.config.get(guild_id, "stickies", {}))
+        if definition is None:
+            stickies.pop(str(channel_id), None)
+        else:
+            stickies[str(channel_id)] = definition
+        self.config.set(guild_id, "stickies", stickies)
+
+    def start_sticky(self, channel, definition):
+        """Starts keeping a sticky message at the bottom of a channel."""
+        self.sticky_tasks[channel.id] = self.bot.tasks.spawn(
+            self, self.run_sticky(channel, definition), name=f"sticky in #{channel}"
+        )
+
+    def restore_stickies(self, only_guild_id=None):
+        """Restarts the sticky messages saved in the guild settings."""
+        for guild_id, stickies in self.config.all("stickies").items():
+            if only_guild_id is not None and guild_id != only_guild_id:
+                continue
+            for channel_id, definition in stickies.items():
+                channel = self.bot.get_channel(int(channel_id))
+                if channel is None or channel.id in self.sticky_tasks:
+                    continue
+                self.start_sticky(channel, definition)
+
+    async def run_sticky(self, channel, definition):
+        """Reposts a sticky message whenever someone else writes in the channel."""
+        content = definition["content"]
+        embeds = [discord.Embed.from_dict(embed) for embed in definition["embeds"]]
+
+        # Remove the copy left behind by a previous run
+        if definition.get("message_id"):
+            try:
+                await channel.get_partial_message(definition["message_id"]).delete()
+            except discord.HTTPException:
+                pass
+
         try:
-            sticky_msg = await channel.send(
-                content=original_message.content, embeds=original_message.embeds
-            )
+            sticky_msg = await channel.send(content=content, embeds=embeds)
         except discord.HTTPException as e:
-            await ctx.send(
-                f"❌ Failed to send the sticky message: {e}", delete_after=10
-            )
+            log.error(f"Failed to send sticky message in {channel}: {e}")
+            self.sticky_tasks.pop(channel.id, None)
             return
 
         self.sticky_messages[channel.id] = sticky_msg
+        definition["message_id"] = sticky_msg.id
+        self.save_sticky(channel.guild.id, channel.id, definition)
 
         def check(message):
-            return message.channel == channel and message.id != sticky_msg.id
+            return message.channel.id == channel.id and message.id != sticky_msg.id
 
         try:
             while True:
@@ -250,21 +956,19 @@ class Msg(
                 try:
                     # Delete the old sticky message and resend it
                     await sticky_msg.delete()
-                    sticky_msg = await channel.send(
-                        content=original_message.content, embeds=original_message.embeds
-                    )
+                    sticky_msg = await channel.send(content=content, embeds=embeds)
                     self.sticky_messages[channel.id] = sticky_msg
+                    definition["message_id"] = sticky_msg.id
+                    self.save_sticky(channel.guild.id, channel.id, definition)
                 except discord.HTTPException as e:
-                    print(f"Error updating sticky message: {e}")
+                    log.error(f"Error updating sticky message: {e}")
                     break
-        except asyncio.CancelledError:
-            # Cleanup when the sticky message is stopped
-            await sticky_msg.delete()
-            del self.sticky_messages[channel.id]
         except Exception as e:
-            print(f"Unexpected error in sticky message: {e}")
-            await sticky_msg.delete()
-            del self.sticky_messages[channel.id]
+            # Cancellation is not caught here: when stopped, stop_sticky deletes the
+            # posted copy, when unloaded it is replaced once the sticky is restored
+            log.exception(f"Unexpected error in sticky message: {e}")
+        self.sticky_tasks.pop(channel.id, None)
+        self.sticky_messages.pop(channel.id, None)
 
     @commands.command(name="stop_sticky", aliases=["unsticky"])
     @commands.has_permissions(manage_messages=True)
@@ -279,9 +983,15 @@ class Msg(
         `!stop_sticky`
         """
         channel = ctx.channel
-        if channel.id in self.sticky_messages:
-            await self.sticky_messages[channel.id].delete()
-            del self.sticky_messages[channel.id]
+        if channel.id in self.sticky_tasks:
+            self.sticky_tasks.pop(channel.id).cancel()
+            sticky_msg = self.sticky_messages.pop(channel.id, None)
+            if sticky_msg:
+                try:
+                    await sticky_msg.delete()
+                except discord.NotFound:
+                    pass
+            self.save_sticky(ctx.guild.id, channel.id, None)
             await ctx.send("✅ Sticky message stopped.", delete_after=10)
         else:
             await ctx.send(
@@ -316,20 +1026,40 @@ class Msg(
             await ctx.send("❌ Please specify at least one channel.", delete_after=10)
             return
 
-        for channel in channels:
-            try:
-                await channel.send(message_content)
-            except discord.Forbidden:
-                await ctx.send(
-                    f"❌ I don't have permission to send messages in {channel.mention}.",
-                    delete_after=10,
-                )
-            except discord.HTTPException as e:
-                await ctx.send(
-                    f"❌ An error occurred in {channel.mention}: {e}", delete_after=10
-                )
+        # Drop duplicate mentions while keeping the given order
+        channels = list(dict.fromkeys(channels))
+        sent, failed, elapsed = await broadcast(channels, message_content)
 
-        await ctx.send(f"✅ Message sent to {len(channels)} channels.", delete_after=10)
+        embed = discord.Embed(
+            title="📢 Broadcast Summary",
+            color=discord.Color.green() if not failed else discord.Color.orange(),
+        )
+        embed.add_field(
+            name=f"✅ Sent ({len(sent)})",
+            value=self.truncate_lines([channel.mention for channel in sent]),
+            inline=False,
+        )
+        if failed:
+            embed.add_field(
+                name=f"❌ Failed ({len(failed)})",
+                value=self.truncate_lines(
+                    [f"{channel.mention}: {error}" for channel, error in failed]
+                ),
+                inline=False,
+            )
+        embed.set_footer(text=f"Sent to {len(channels)} channels in {elapsed:.2f}s")
+        await ctx.send(embed=embed)
+
+    @staticmethod
+    def truncate_lines(lines, limit=1024):
+        """Joins lines into an embed field value without exceeding Discord's limit."""
+        value = ""
+        for index, line in enumerate(lines):
+            if len(value) + len(line) + 20 > limit:
+                value += f"…and {len(lines) - index} more"
+                break
+            value += line + "\n"
+        return value or "None"
 
     @commands.command(name="schedule_msg", aliases=["schedule"])
     @commands.has_permissions(manage_channels=True)
@@ -354,7 +1084,7 @@ class Msg(
             )
             return
 
-        class ChannelSelectView(ui.View):
+        class ChannelSelectView(CountedView):
             def __init__(self, channels, timeout=60):
                 super().__init__(timeout=timeout)
                 self.channel_id = None
@@ -394,7 +1124,7 @@ class Msg(
         )
 
         # Step 2: Select Date
-        class DateSelectView(ui.View):
+        class DateSelectView(CountedView):
             def __init__(self, timeout=60):
                 super().__init__(timeout=timeout)
                 self.selected_date = None
@@ -435,7 +1165,7 @@ class Msg(
         )
 
         # Step 3: Select Hour
-        class HourSelectView(ui.View):
+        class HourSelectView(CountedView):
             def __init__(self, timeout=60):
                 super().__init__(timeout=timeout)
                 self.selected_hour = None
@@ -474,7 +1204,7 @@ class Msg(
         )
 
         # Step 4: Select Minute
-        class MinuteSelectView(ui.View):
+        class MinuteSelectView(CountedView):
             def __init__(self, timeout=60):
                 super().__init__(timeout=timeout)
                 self.selected_minute = None
@@ -532,7 +1262,7 @@ class Msg(
             return
 
         # Step 6: Confirm Scheduling
-        class ConfirmScheduleView(ui.View):
+        class ConfirmScheduleView(CountedView):
             def __init__(self, timeout=60):
                 super().__init__(timeout=timeout)
                 self.value = None
@@ -599,15 +1329,19 @@ class Msg(
                 channel_id=target_channel.id,
                 schedule_time=schedule_time_utc,
                 content=message_content,
+                guild_id=target_channel.guild.id,
             )
 
             # Schedule the message
-            scheduled_message.task = self.bot.loop.create_task(
-                self.send_scheduled_message(scheduled_message)
+            scheduled_message.task = self.bot.tasks.spawn(
+                self,
+                self.send_scheduled_message(scheduled_message),
+                name=f"scheduled message {scheduled_message.id}",
             )
 
-            # Add to the list of scheduled messages
+            # Add to the list of scheduled messages and keep it across restarts
             self.scheduled_messages.append(scheduled_message)
+            self.save_scheduled(scheduled_message.guild_id)
 
             await ctx.send(
                 f"⏳ Message scheduled for {schedule_time.strftime('%Y-%m-%d %H:%M %Z')} with ID `{scheduled_message.id}`.",
@@ -625,18 +1359,67 @@ class Msg(
         if delay > 0:
             await asyncio.sleep(delay)
 
-        channel = self.bot.get_channel(scheduled_message.channel_id)
-        if channel:
-            try:
-                await channel.send(scheduled_message.content)
-                # Remove the scheduled message after sending
-                self.scheduled_messages.remove(scheduled_message)
-            except Exception as e:
-                print(
-                    f"Failed to send scheduled message ID {scheduled_message.id}: {e}"
-                )
+        # The channel is not cached while its guild's shard is reconnecting,
+        # sending by ID works regardless
+        channel = self.bot.get_channel(
+            scheduled_message.channel_id
+        ) or self.bot.get_partial_messageable(
+            scheduled_message.channel_id, guild_id=scheduled_message.guild_id
+        )
+        try:
+            await channel.send(scheduled_message.content)
+            # Remove the scheduled message after sending
+            self.scheduled_messages.remove(scheduled_message)
+            self.save_scheduled(scheduled_message.guild_id)
+        except Exception as e:
+            log.error(
+                f"Failed to send scheduled message ID {scheduled_message.id}: {e}"
+            )
+
+    def save_scheduled(self, guild_id):
+        """Stores a guild's scheduled messages so they are sent after a restart."""
+        if guild_id is None:
+            return
+        entries = [
+            {
+                "id": msg.id,
+                "author_id": msg.author_id,
+                "channel_id": msg.channel_id,
+                "schedule_time": msg.schedule_time.isoformat(),
+                "content": msg.content,
+            }
+            for msg in self.scheduled_messages
+            if msg.guild_id == guild_id
+        ]
+        if entries:
+            self.config.set(guild_id, "scheduled_messages", entries)
         else:
-            print(f"Channel with ID {scheduled_message.channel_id} not found.")
+            self.config.delete(guild_id, "scheduled_messages")
+
+    def restore_scheduled(self):
+        """Schedules the saved messages again; ones that came due while the bot
+        was offline are sent right away."""
+        known = {msg.id for msg in self.scheduled_messages}
+        for guild_id, entries in self.config.all("scheduled_messages").items():
+            for entry in entries:
+                if entry["id"] in known:
+                    continue
+                scheduled_message = ScheduledMessage(
+                    author_id=entry["author_id"],
+                    channel_id=entry["channel_id"],
+                    schedule_time=datetime.datetime.fromisoformat(
+                        entry["schedule_time"]
+                    ),
+                    content=entry["content"],
+                    guild_id=guild_id,
+                    message_id=entry["id"],
+                )
+                scheduled_message.task = self.bot.tasks.spawn(
+                    self,
+                    self.send_scheduled_message(scheduled_message),
+                    name=f"scheduled message {scheduled_message.id}",
+                )
+                self.scheduled_messages.append(scheduled_message)
 
     @commands.command(name="show_scheduled_msgs", aliases=["list_scheduled_msgs"])
     @commands.has_permissions(manage_messages=True)
@@ -717,6 +1500,7 @@ class Msg(
         # Cancel the task
         scheduled_message.task.cancel()
         self.scheduled_messages.remove(scheduled_message)
+        self.save_scheduled(scheduled_message.guild_id)
         await ctx.send(
             f"✅ Scheduled message with ID `{message_id}` has been cancelled.",
             delete_after=10,
@@ -725,6 +1509,69 @@ class Msg(
     # --------------------------------------
     # Purge Commands
     # --------------------------------------
+    async def delete_in_bulk(self, channel, messages):
+        """Deletes messages using bulk calls where Discord allows it.
+
+        Bulk deletes take at most 100 messages younger than 14 days; anything
+        older has to be deleted one by one. Returns the number of deleted messages.
+        """
+        # Keep a minute of margin so messages don't age out mid-request
+        cutoff = discord.utils.time_snowflake(
+            discord.utils.utcnow() - datetime.timedelta(days=14, minutes=-1)
+        )
+        recent = [msg for msg in messages if msg.id > cutoff]
+        old = [msg for msg in messages if msg.id <= cutoff]
+
+        deleted_count = 0
+        for i in range(0, len(recent), 100):
+            chunk = recent[i : i + 100]
+            await channel.delete_messages(chunk)
+            deleted_count += len(chunk)
+
+        for msg in old:
+            try:
+                await msg.delete()
+                deleted_count += 1
+            except discord.NotFound:
+                pass  # Message was already deleted
+
+        return deleted_count
+
+    async def purge_matching(
+        self,
+        channel,
+        check,
+        *,
+        limit=None,
+        before=None,
+        max_matches=None,
+        on_progress=None,
+    ):
+        """Streams a channel's history and deletes matching messages in bulk batches.
+
+        Stops after `limit` scanned messages or `max_matches` matches, whichever
+        comes first. `on_progress` is called with the running deleted count.
+        """
+        batch = []
+        deleted_count = 0
+        found = 0
+        async for msg in channel.history(limit=limit, before=before):
+            if not check(msg):
+                continue
+            batch.append(msg)
+            found += 1
+            if len(batch) == 100:
+                deleted_count += await self.delete_in_bulk(channel, batch)
+                batch = []
+                if on_progress:
+                    on_progress(deleted_count)
+            if max_matches is not None and found >= max_matches:
+                break
+        if batch:
+            deleted_count += await self.delete_in_bulk(channel, batch)
+            if on_progress:
+                on_progress(deleted_count)
+        return deleted_count
 
     @commands.command(name="purge_channel", aliases=["clear_channel", "clear"])
     @commands.has_permissions(manage_messages=True)
@@ -823,7 +1670,7 @@ class Msg(
         target_channel = channel or ctx.channel
 
         # Confirm the purge action with the user using buttons
-        class ConfirmPurgeView(ui.View):
+        class ConfirmPurgeView(CountedView):
             def __init__(self, timeout=30):
                 super().__init__(timeout=timeout)
                 self.value = None
@@ -926,7 +1773,7 @@ class Msg(
                 return
 
             # Confirm the purge action with the user using buttons
-            class ConfirmPurgeView(ui.View):
+            class ConfirmPurgeView(CountedView):
                 def __init__(self, timeout=30):
                     super().__init__(timeout=timeout)
                     self.value = None
@@ -1008,23 +1855,32 @@ class Msg(
         `!purge_user`
 
         After invoking the command, you'll be prompted to select a user and specify the number of messages to delete.
+        Only the last 5000 messages of the channel are searched.
         """
 
-        # Get the list of members who have sent messages in the channel
-        messages = await ctx.channel.history(limit=100).flatten()
-        users = list({msg.author for msg in messages})
+        # Seed the index from recent history once per channel, oldest first so
+        # the authors seen live since startup stay the most recent
+        if not self.recent_authors.is_seeded(ctx.channel.id):
+            history = [msg async for msg in ctx.channel.history(limit=100)]
+            for msg in reversed(history):
+                if msg.author != self.bot.user:
+                    self.recent_authors.record(
+                        ctx.channel.id, msg.author.id, msg.author.display_name
+                    )
+            self.recent_authors.mark_seeded(ctx.channel.id)
 
-        if not users:
+        authors = self.recent_authors.get(ctx.channel.id)
+        if not authors:
             await ctx.send("❌ No users found in the recent messages.", delete_after=10)
             return
 
         # Create a select menu for users
         options = [
-            discord.SelectOption(label=user.display_name, value=str(user.id))
-            for user in users[:25]  # Max options for select menu is 25
+            discord.SelectOption(label=name[:100], value=str(author_id))
+            for author_id, name in authors[:25]  # Max options for select menu is 25
         ]
 
-        class UserSelectView(ui.View):
+        class UserSelectView(CountedView):
             def __init__(self, timeout=30):
                 super().__init__(timeout=timeout)
                 self.user_id = None
@@ -1033,7 +1889,7 @@ class Msg(
                 placeholder="Select a user to purge messages from...", options=options
             )
             async def select_user(
-                self, select: ui.Select, interaction: discord.Interaction
+                self, interaction: discord.Interaction, select: ui.Select
             ):
                 self.user_id = int(select.values[0])
                 self.stop()
@@ -1052,9 +1908,10 @@ class Msg(
             )
             return
 
-        # Get the selected user
-        user = ctx.guild.get_member(user_select_view.user_id)
-        await select_message.edit(content=f"Selected user: {user.mention}", view=None)
+        # The user may have left the server, so work with the ID only
+        user_id = user_select_view.user_id
+        user_mention = f"<@{user_id}>"
+        await select_message.edit(content=f"Selected user: {user_mention}", view=None)
 
         # Ask for the amount
         await ctx.send(
@@ -1078,14 +1935,14 @@ class Msg(
                 return
 
             # Confirm the purge action with the user using buttons
-            class ConfirmPurgeView(ui.View):
+            class ConfirmPurgeView(CountedView):
                 def __init__(self, timeout=30):
                     super().__init__(timeout=timeout)
                     self.value = None
 
                 @ui.button(label="Confirm", style=discord.ButtonStyle.danger)
                 async def confirm(
-                    self, button: ui.Button, interaction: discord.Interaction
+                    self, interaction: discord.Interaction, button: ui.Button
                 ):
                     self.value = True
                     self.stop()
@@ -1093,7 +1950,7 @@ class Msg(
 
                 @ui.button(label="Cancel", style=discord.ButtonStyle.secondary)
                 async def cancel(
-                    self, button: ui.Button, interaction: discord.Interaction
+                    self, interaction: discord.Interaction, button: ui.Button
                 ):
                     self.value = False
                     self.stop()
@@ -1102,7 +1959,7 @@ class Msg(
             confirm_view = ConfirmPurgeView()
 
             confirm_message = await ctx.send(
-                f"⚠️ Are you sure you want to delete the last **{amount} messages** from {user.mention} in {ctx.channel.mention}?",
+                f"⚠️ Are you sure you want to delete the last **{amount} messages** from {user_mention} in {ctx.channel.mention}?",
                 view=confirm_view,
             )
 
@@ -1123,12 +1980,18 @@ class Msg(
             # Proceed with the purge
             await confirm_message.edit(content="🔄 Purging messages...", view=None)
 
-            def message_check(msg):
-                return msg.author == user
+            # Walk back through history only until enough messages were found,
+            # and not through the whole channel if the user has fewer
+            deleted_count = await self.purge_matching(
+                ctx.channel,
+                lambda msg: msg.author.id == user_id,
+                before=confirm_message,
+                limit=PURGE_USER_DEPTH,
+                max_matches=amount,
+            )
 
-            deleted = await ctx.channel.purge(limit=amount, check=message_check)
             await ctx.send(
-                f"✅ Deleted {len(deleted)} messages from {user.mention}.",
+                f"✅ Deleted {deleted_count} messages from {user_mention}.",
                 delete_after=10,
             )
         except asyncio.TimeoutError:
@@ -1148,64 +2011,298 @@ class Msg(
                 delete_after=10,
             )
 
+    # --------------------------------------
+    # Command: purge_user_server
+    # --------------------------------------
+    @commands.command(name="purge_user_server", aliases=["purge_user_all"])
+    @commands.guild_only()
+    @commands.has_permissions(manage_messages=True)
+    @delete_command_message(delay=0)
+    async def purge_user_server(
+        self, ctx, user: discord.User = None, depth: int = 1000
+    ):
+        """Deletes a user's messages in every text channel and thread of the server.
+
+        **Usage:**
+        `!purge_user_server <user> [depth]`
+
+        **Example:**
+        `!purge_user_server @spammer 500`
+
+        `depth` is the number of messages searched per channel (default 1000).
+        Channels are purged in parallel and progress is shown in a single live summary.
+        """
+        if user is None:
+            await ctx.send(
+                "❌ Please mention the user whose messages should be deleted.",
+                delete_after=10,
+            )
+            return
+
+        if depth <= 0:
+            await ctx.send(
+                "❌ Please specify a positive number of messages to search.",
+                delete_after=10,
+            )
+            return
+
+        # Only channels where we can both read history and delete messages
+        channels = [
+            channel
+            for channel in [*ctx.guild.text_channels, *ctx.guild.threads]
+            if channel.permissions_for(ctx.guild.me).read_message_history
+            and channel.permissions_for(ctx.guild.me).manage_messages
+        ]
+        if not channels:
+            await ctx.send(
+                "❌ I can't delete messages in any channel of this server.",
+                delete_after=10,
+            )
+            return
+
+        # Confirm the purge action with the user using buttons
+        class ConfirmPurgeView(CountedView):
+            def __init__(self, timeout=30):
+                super().__init__(timeout=timeout)
+                self.value = None
+
+            async def interaction_check(self, interaction: discord.Interaction):
+                # Only the moderator who asked may approve a server-wide purge
+                if interaction.user != ctx.author:
+                    await interaction.response.send_message(
+                        "❌ You are not authorized to perform this action.",
+                        ephemeral=True,
+                    )
+                    return False
+                return True
+
+            @ui.button(label="Confirm", style=discord.ButtonStyle.danger)
+            async def confirm(
+                self, interaction: discord.Interaction, button: ui.Button
+            ):
+                self.value = True
+                self.stop()
+                await interaction.response.defer()
+
+            @ui.button(label="Cancel", style=discord.ButtonStyle.secondary)
+            async def cancel(self, interaction: discord.Interaction, button: ui.Button):
+                self.value = False
+                self.stop()
+                await interaction.response.defer()
+
+        confirm_view = ConfirmPurgeView()
+        status_message = await ctx.send(
+            f"⚠️ Are you sure you want to delete messages from {user.mention} in the last **{depth} messages** of **{len(channels)} channels**?",
+            view=confirm_view,
+        )
+        await confirm_view.wait()
+
+        if confirm_view.value is None:
+            await status_message.edit(
+                content="⏳ Purge operation cancelled due to timeout.", view=None
+            )
+            return
+        elif confirm_view.value is False:
+            await status_message.edit(
+                content="❌ Purge operation cancelled.", view=None
+            )
+            return
+
+        # Per-channel status and deleted count, updated by the workers
+        progress = {channel.id: ["⏳", 0] for channel in channels}
+        queue = asyncio.Queue()
+        for channel in channels:
+            queue.put_nowait(channel)
+
+        def build_embed(finished=False):
+            done = sum(1 for status, _ in progress.values() if status in ("✅", "❌"))
+            total_deleted = sum(count for _, count in progress.values())
+            embed = discord.Embed(
+                title=(
+                    f"🧹 Purge of {user.display_name} finished"
+                    if finished
+                    else f"🧹 Purging {user.display_name} server-wide..."
+                ),
+                color=discord.Color.green() if finished else discord.Color.orange(),
+            )
+            # Only list channels that are active, had matches or failed
+            lines = []
+            for channel in channels:
+                status, count = progress[channel.id]
+                if status in ("🔄", "❌") or count:
+                    lines.append(f"{status} {channel.mention}: {count}")
+            embed.description = (
+                self.truncate_lines(lines, limit=4096)
+                if lines
+                else "No messages deleted yet."
+            )
+            embed.add_field(name="Channels", value=f"{done}/{len(channels)}")
+            embed.add_field(name="Deleted", value=str(total_deleted))
+            return embed
+
+        async def worker():
+            # Each worker handles one channel at a time, so there is never more
+            # than one delete in flight per channel rate-limit bucket
+            while not queue.empty():
+                channel = queue.get_nowait()
+                entry = progress[channel.id]
+                entry[0] = "🔄"
+
+                def on_progress(count, entry=entry):
+                    entry[1] = count
+
+                try:
+                    await self.purge_matching(
+                        channel,
+                        lambda msg: msg.author.id == user.id,
+                        limit=depth,
+                        on_progress=on_progress,
+                    )
+                    entry[0] = "✅"
+                except discord.HTTPException as e:
+                    log.error(f"Error purging {user} in {channel}: {e}")
+                    entry[0] = "❌"
+
+        workers = [
+            asyncio.create_task(worker())
+            for _ in range(min(GUILD_PURGE_WORKERS, len(channels)))
+        ]
+        try:
+            # Refresh the summary every few seconds until all workers are finished
+            await status_message.edit(content=None, embed=build_embed(), view=None)
+            pending = workers
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=3, return_when=asyncio.FIRST_EXCEPTION
+                )
+                for task in done:
+                    task.result()  # Raises an unexpected error of a worker
+                if pending:
+                    await status_message.edit(embed=build_embed())
+        finally:
+            # If a worker failed or the command was cancelled, don't leave the
+            # other workers deleting in the background
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        await status_message.edit(embed=build_embed(finished=True))
+
     # --------------------------------------
     # Command: purge_contains
     # --------------------------------------
     @commands.command(name="purge_contains", aliases=["purge_keyword"])
     @commands.has_permissions(manage_messages=True)
     @delete_command_message(delay=0)
-    async def purge_contains(self, ctx):
-        """Deletes messages containing a specific keyword in the current channel.
+    async def purge_contains(self, ctx, *, filters: PurgeFilterFlags = None):
+        """Deletes messages matching keywords, regexes, authors or attachments.
 
         **Usage:**
         `!purge_contains`
+        `!purge_contains [--keyword <text>]... [--regex <pattern>]... [--author <user>]... [--attachments yes|no] [--depth <messages>] [--dry_run yes]`
 
         **Example:**
         `!purge_contains`
+        `!purge_contains --keyword free nitro --regex discord\\.gg/\\w+ --depth 5000`
+        `!purge_contains --author @spammer --attachments yes --dry_run yes`
 
-        After invoking the command, you'll be prompted to enter the keyword and specify the number of messages to search.
+        Without flags you'll be prompted to enter the keyword and specify the number of messages to search.
+        With flags the last 10000 messages are searched unless `--depth` is given, and `--dry_run yes` only counts the matches.
         """
 
-        # Ask for the keyword
-        await ctx.send("🔍 Please enter the keyword to search for:", delete_after=30)
-
         def check(m):
             return m.author == ctx.author and m.channel == ctx.channel
 
         try:
-            keyword_msg = await self.bot.wait_for("message", timeout=30.0, check=check)
-            keyword = keyword_msg.content.strip()
-            await keyword_msg.delete()
+            if filters is None:
+                # Ask for the keyword
+                await ctx.send(
+                    "🔍 Please enter the keyword to search for:", delete_after=30
+                )
 
-            if not keyword:
-                await ctx.send("❌ Please provide a valid keyword.", delete_after=10)
-                return
+                keyword_msg = await self.bot.wait_for(
+                    "message", timeout=30.0, check=check
+                )
+                keyword = keyword_msg.content.strip()
+                await keyword_msg.delete()
 
-            # Ask for the amount
-            await ctx.send(
-                "📝 Please enter the number of messages to search:", delete_after=30
-            )
+                if not keyword:
+                    await ctx.send(
+                        "❌ Please provide a valid keyword.", delete_after=10
+                    )
+                    return
 
-            amount_msg = await self.bot.wait_for("message", timeout=30.0, check=check)
-            amount = int(amount_msg.content)
-            await amount_msg.delete()
+                # Ask for the amount
+                await ctx.send(
+                    "📝 Please enter the number of messages to search:", delete_after=30
+                )
 
-            if amount <= 0:
+                amount_msg = await self.bot.wait_for(
+                    "message", timeout=30.0, check=check
+                )
+                depth = int(amount_msg.content)
+                await amount_msg.delete()
+
+                message_filter = MessageFilter(keywords=[keyword])
+                dry_run = False
+            else:
+                message_filter = MessageFilter(
+                    keywords=filters.keyword,
+                    patterns=filters.regex,
+                    author_ids=[user.id for user in filters.author],
+                    has_attachments=filters.attachments,
+                )
+                depth = PURGE_CONTAINS_DEPTH if filters.depth is None else filters.depth
+                dry_run = filters.dry_run
+
+                if not message_filter:
+                    await ctx.send(
+                        "❌ Please provide at least one `--keyword`, `--regex`, `--author` or `--attachments` filter.",
+                        delete_after=10,
+                    )
+                    return
+
+            if depth is not None and depth <= 0:
                 await ctx.send(
                     "❌ Please specify a positive number of messages to search.",
                     delete_after=10,
                 )
                 return
 
+            scope = (
+                f"the last {depth} messages" if depth is not None else "all messages"
+            )
+
+            if dry_run:
+                status_message = await ctx.send(
+                    f"🔍 Counting messages matching {message_filter.describe()} in {scope}..."
+                )
+                scanned = 0
+                authors = Counter()
+                async for msg in ctx.channel.history(limit=depth, before=ctx.message):
+                    scanned += 1
+                    if message_filter.matches(msg):
+                        authors[msg.author.id] += 1
+
+                top_authors = "\n".join(
+                    f"<@{author_id}>: {count}"
+                    for author_id, count in authors.most_common(5)
+                )
+                await status_message.edit(
+                    content=f"🧪 Dry run: **{sum(authors.values())}** of {scanned} scanned messages match."
+                    + (f"\n{top_authors}" if top_authors else "")
+                )
+                return
+
             # Confirm the purge action with the user using buttons
-            class ConfirmPurgeView(ui.View):
+            class ConfirmPurgeView(CountedView):
                 def __init__(self, timeout=30):
                     super().__init__(timeout=timeout)
                     self.value = None
 
                 @ui.button(label="Confirm", style=discord.ButtonStyle.danger)
                 async def confirm(
-                    self, button: ui.Button, interaction: discord.Interaction
+                    self, interaction: discord.Interaction, button: ui.Button
                 ):
                     self.value = True
                     self.stop()
@@ -1213,7 +2310,7 @@ class Msg(
 
                 @ui.button(label="Cancel", style=discord.ButtonStyle.secondary)
                 async def cancel(
-                    self, button: ui.Button, interaction: discord.Interaction
+                    self, interaction: discord.Interaction, button: ui.Button
                 ):
                     self.value = False
                     self.stop()
@@ -1222,7 +2319,7 @@ class Msg(
             confirm_view = ConfirmPurgeView()
 
             confirm_message = await ctx.send(
-                f"⚠️ Are you sure you want to delete messages containing `{keyword}` in the last {amount} messages in {ctx.channel.mention}?",
+                f"⚠️ Are you sure you want to delete messages matching {message_filter.describe()} in {scope} in {ctx.channel.mention}?",
                 view=confirm_view,
             )
 
@@ -1243,13 +2340,16 @@ class Msg(
             # Proceed with the purge
             await confirm_message.edit(content="🔄 Purging messages...", view=None)
 
-            def message_check(msg):
-                return keyword.lower() in msg.content.lower()
+            deleted_count = await self.purge_matching(
+                ctx.channel, message_filter.matches, limit=depth, before=ctx.message
+            )
 
-            deleted = await ctx.channel.purge(limit=amount, check=message_check)
+            await confirm_message.edit(
+                content=f"✅ Deleted {deleted_count} messages matching {message_filter.describe()}."
+            )
+        except SlowPatternError as e:
             await ctx.send(
-                f"✅ Deleted {len(deleted)} messages containing `{keyword}`.",
-                delete_after=10,
+                f"❌ Stopped: {e}. Please use a simpler pattern.", delete_after=10
             )
         except asyncio.TimeoutError:
             await ctx.send("⏳ Operation cancelled due to timeout.", delete_after=10)
@@ -1257,6 +2357,8 @@ class Msg(
             await ctx.send(
                 "❌ Invalid number. Please enter a valid integer.", delete_after=10
             )
+        except (re.error, regex.error) as e:
+            await ctx.send(f"❌ Invalid regular expression: {e}", delete_after=10)
         except discord.Forbidden:
             await ctx.send(
                 "❌ I don't have permission to delete messages in this channel.",
@@ -0,0 +1,146 @@
+# config_store.py
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+log = logging.getLogger(__name__)
+
+# Database file holding the per-guild settings
+CONFIG_DB = os.path.join("./config", "guild_config.db")
+
+# Seconds to wait for more changes before writing them to disk
+FLUSH_DELAY = 2.0
+
+_DELETED = object()  # Marks a pending deletion in the write-behind buffer
+
+
+class GuildConfigStore:
+    """Per-guild settings kept in memory and persisted to SQLite in the background.
+
+    Every setting is loaded into a dictionary at startup, so reads never touch
+    the disk. Writes update the dictionary immediately and are collected in a
+    buffer that is flushed to the database (in WAL mode) from a thread shortly
+    after the last change. Values must be JSON serializable.
+    """
+
+    def __init__(self, path=CONFIG_DB):
+        self.path = path
+        self.cache = {}  # guild_id -> {key: value}
+        self.pending = {}  # (guild_id, key) -> value or _DELETED
+        self.flush_handle = None
+        self.flush_task = None
+        self.lock = threading.Lock()
+        self.connection = None
+
+    def load(self):
+        """Opens the database and loads every setting into memory. Blocking."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS guild_settings (
+                guild_id INTEGER NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (guild_id, key)
+            ) WITHOUT ROWID
+            """
+        )
+        for guild_id, key, value in self.connection.execute(
+            "SELECT guild_id, key, value FROM guild_settings"
+        ):
+            self.cache.setdefault(guild_id, {})[key] = json.loads(value)
+
+    def get(self, guild_id, key, default=None):
+        """Returns a guild's setting from memory."""
+        return self.cache.get(guild_id, {}).get(key, default)
+
+    def set(self, guild_id, key, value):
+        """Changes a guild's setting; it is written to disk shortly after."""
+        self.cache.setdefault(guild_id, {})[key] = value
+        self.pending[(guild_id, key)] = value
+        self.schedule_flush()
+
+    def delete(self, guild_id, key):
+        """Removes a guild's setting."""
+        settings = self.cache.get(guild_id, {})
+        if key in settings:
+            del settings[key]
+            self.pending[(guild_id, key)] = _DELETED
+            self.schedule_flush()
+
+    def all(self, key):
+        """Returns {guild_id: value} for every guild that has the setting."""
+        return {
+            guild_id: settings[key]
+            for guild_id, settings in self.cache.items()
+            if key in settings
+        }
+
+    def schedule_flush(self):
+        """Debounces writes so bursts of changes end up in one transaction."""
+        if self.flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self.flush_handle = loop.call_later(FLUSH_DELAY, self.start_flush)
+
+    def start_flush(self):
+        self.flush_handle = None
+        if self.flush_task is not None and not self.flush_task.done():
+            # The previous write is still running, keep writes in order
+            self.schedule_flush()
+            return
+        self.flush_task = asyncio.ensure_future(self.flush())
+
+    async def flush(self):
+        """Writes all pending changes to the database."""
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, {}
+        try:
+            await asyncio.to_thread(self.write, pending)
+        except sqlite3.Error as e:
+            log.error(f"Failed to write guild settings: {e}")
+            # Put the changes back unless they were overwritten in the meantime
+            for setting, value in pending.items():
+                self.pending.setdefault(setting, value)
+            self.schedule_flush()
+
+    def write(self, pending):
+        """Applies pending changes in a single transaction. Blocking."""
+        upserts = [
+            (guild_id, key, json.dumps(value))
+            for (guild_id, key), value in pending.items()
+            if value is not _DELETED
+        ]
+        deletions = [
+            (guild_id, key)
+            for (guild_id, key), value in pending.items()
+            if value is _DELETED
+        ]
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT INTO guild_settings (guild_id, key, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (guild_id, key) DO UPDATE SET value = excluded.value",
+                upserts,
+            )
+            self.connection.executemany(
+                "DELETE FROM guild_settings WHERE guild_id = ? AND key = ?", deletions
+            )
+
+    async def close(self):
+        """Flushes outstanding changes and closes the database."""
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if self.flush_task is not None:
+            await self.flush_task
+        await self.flush()
+        if self.connection is not None:
+            with self.lock:
+                self.connection.close()
+            self.connection = None
@@ -0,0 +1,114 @@
+# exporter.py
+import gzip
+import json
+import os
+
+# Directory where channel exports are written
+EXPORT_DIR = os.path.join("./config", "exports")
+
+
+def serialize_message(message):
+    """Converts a message into a JSON serializable dictionary."""
+    return {
+        "id": message.id,
+        "channel_id": message.channel.id,
+        "guild_id": message.guild.id if message.guild else None,
+        "author": {
+            "id": message.author.id,
+            "name": message.author.name,
+            "display_name": message.author.display_name,
+            "bot": message.author.bot,
+        },
+        "created_at": message.created_at.isoformat(),
+        "edited_at": message.edited_at.isoformat() if message.edited_at else None,
+        "type": message.type.name,
+        "content": message.content,
+        "attachments": [
+            {
+                "id": attachment.id,
+                "filename": attachment.filename,
+                "url": attachment.url,
+                "size": attachment.size,
+                "content_type": attachment.content_type,
+            }
+            for attachment in message.attachments
+        ],
+        "embeds": [embed.to_dict() for embed in message.embeds],
+        "reference": message.reference.message_id if message.reference else None,
+        "pinned": message.pinned,
+    }
+
+
+class ChannelExport:
+    """A gzip compressed NDJSON export of one channel with a resumable checkpoint.
+
+    Every batch is written as its own gzip member and the checkpoint records
+    the file size and last message ID after each batch. Concatenated members
+    read back as one stream, and a batch cut short by a crash is simply
+    truncated away on resume.
+
+    All methods do blocking file I/O and should be run in a thread.
+    """
+
+    def __init__(self, channel_id, directory=EXPORT_DIR):
+        self.channel_id = channel_id
+        self.path = os.path.join(directory, f"{channel_id}.ndjson.gz")
+        self.checkpoint_path = os.path.join(directory, f"{channel_id}.checkpoint.json")
+        self.last_message_id = None
+        self.count = 0
+        self.offset = 0  # Size of the export file at the last checkpoint
+
+    def load_checkpoint(self):
+        """Restores the last checkpoint and drops any partially written batch."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        try:
+            with open(self.checkpoint_path, "r") as f:
+                checkpoint = json.load(f)
+            self.last_message_id = checkpoint["last_message_id"]
+            self.count = checkpoint["count"]
+            self.offset = checkpoint["offset"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            # No usable checkpoint, start from scratch
+            self.last_message_id = None
+            self.count = 0
+            self.offset = 0
+
+        if os.path.exists(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(self.offset)
+
+    def write_batch(self, records):
+        """Appends a batch of serialized messages and checkpoints it."""
+        if not records:
+            return
+        with open(self.path, "ab") as f:
+            with gzip.GzipFile(fileobj=f, mode="wb", mtime=0) as gz:
+                for record in records:
+                    gz.write(
+                        json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+                    )
+            f.flush()
+            os.fsync(f.fileno())
+            self.offset = f.tell()
+
+        self.last_message_id = records[-1]["id"]
+        self.count += len(records)
+        self.save_checkpoint()
+
+    def save_checkpoint(self):
+        """Atomically writes the current checkpoint."""
+        temp_path = f"{self.checkpoint_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(
+                {
+                    "last_message_id": self.last_message_id,
+                    "count": self.count,
+                    "offset": self.offset,
+                },
+                f,
+            )
+        os.replace(temp_path, self.checkpoint_path)
+
+    def size(self):
+        """Returns the current size of the export file in bytes."""
+        return self.offset
@@ -0,0 +1,130 @@
+# log_config.py
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+# Level of the messages that are written out (DEBUG, INFO, WARNING, ...)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# "json" writes one JSON object per line, "text" is easier to read by hand
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+
+# Identical warnings and errors within this many seconds are collapsed
+REPEAT_WINDOW = 60.0
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as single-line JSON objects."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(
+                record.created, datetime.timezone.utc
+            ).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "repeated", 0):
+            entry["repeated"] = record.repeated
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        text = super().format(record)
+        if getattr(record, "repeated", 0):
+            text += f" (repeated {record.repeated} more times)"
+        return text
+
+
+class RepeatFilter(logging.Filter):
+    """Collapses identical warnings and errors repeated within a time window.
+
+    The first occurrence is logged right away. Further identical records
+    (same logger, level and message) are dropped until the window has passed;
+    the next one that gets through carries the number of dropped records.
+    """
+
+    def __init__(self, window=REPEAT_WINDOW):
+        super().__init__()
+        self.window = window
+        self.seen = {}  # (logger, level, message) -> [window start, suppressed]
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING:
+            return True
+        key = (record.name, record.levelno, record.getMessage())
+        now = time.monotonic()
+        with self.lock:
+            seen = self.seen.get(key)
+            if seen is not None and now - seen[0] < self.window:
+                seen[1] += 1
+                return False
+            record.repeated = seen[1] if seen is not None else 0
+            self.seen[key] = [now, 0]
+            if len(self.seen) > 1000:
+                # Forget windows that are over so the table can't grow forever
+                self.seen = {
+                    key: value
+                    for key, value in self.seen.items()
+                    if now - value[0] < self.window
+                }
+        return True
+
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener thread, only rendering what can't wait.
+
+    The message and any traceback are turned into text here, because the
+    arguments and frames may change or be gone by the time the listener gets
+    to them. JSON encoding and writing happen on the listener thread.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging():
+    """Routes all logging through a queue to a background writer thread.
+
+    Returns the started listener; call `stop()` on it to flush on exit.
+    """
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    handler = LogQueueHandler(log_queue)
+    # Also set on the handler: some loggers are lowered below LOG_LEVEL so
+    # their records can be counted, e.g. discord.http for rate limits
+    handler.setLevel(LOG_LEVEL)
+    handler.addFilter(RepeatFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL)
+
+    listener = logging.handlers.QueueListener(log_queue, output)
+    listener.start()
+    return listener
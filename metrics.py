@@ -0,0 +1,131 @@
+# metrics.py
+import bisect
+import logging
+import time
+from collections import Counter, defaultdict
+
+from discord import ui
+
+# Upper bounds of the latency buckets in seconds, anything slower lands in an
+# extra open-ended bucket. Commands range from a few milliseconds to minutes
+# (interactive purges), so the buckets grow roughly geometrically.
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+    300,
+)
+
+
+class Histogram:
+    """Fixed-bucket histogram; constant memory no matter how many values it sees."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Estimates a quantile by interpolating inside the bucket that holds it."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                estimate = lower + (upper - lower) * (rank - cumulative) / count
+                return min(estimate, self.max)
+            cumulative += count
+        return self.max
+
+
+class Metrics:
+    """Counters, gauges and latency histograms collected since the bot started.
+
+    Histograms and counters are grouped in families (e.g. "commands") and
+    labelled within them (e.g. by command name). Gauges are read from
+    callbacks when they are needed, so cogs don't have to push their values.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.histograms = defaultdict(lambda: defaultdict(Histogram))
+        self.counters = defaultdict(Counter)  # family -> {label: count}
+        self.gauges = {}  # name -> (description, callback)
+
+    def observe(self, family, label, value):
+        self.histograms[family][label].observe(value)
+
+    def inc(self, family, label="", amount=1):
+        self.counters[family][label] += amount
+
+    def register_gauge(self, name, description, callback):
+        self.gauges[name] = (description, callback)
+
+    def unregister_gauge(self, name):
+        self.gauges.pop(name, None)
+
+
+class CountedView(ui.View):
+    """Base class of the cogs' interactive views that counts their timeouts
+    in the bot's metrics, by view class.
+
+    Only the repo's own views derive from it; views of other extensions
+    are left alone.
+    """
+
+    metrics = None  # Set by the bot once its metrics exist
+
+    async def on_timeout(self):
+        if CountedView.metrics is not None:
+            CountedView.metrics.inc("view_timeouts", type(self).__name__)
+        await super().on_timeout()
+
+
+class RateLimitFilter(logging.Filter):
+    """Counts the HTTP 429 responses discord.py logs, without hiding the records."""
+
+    def __init__(self, metrics):
+        super().__init__()
+        self.metrics = metrics
+
+    def filter(self, record):
+        message = str(record.msg)
+        if "responded with 429" in message:
+            self.metrics.inc("rate_limits", "bucket")
+        elif "Global rate limit has been hit" in message:
+            # Logged right after the "responded with 429" of the same response,
+            # with no await in between, so no scrape sees it counted twice
+            self.metrics.inc("rate_limits", "bucket", -1)
+            self.metrics.inc("rate_limits", "global")
+        return True
+
+
+def format_duration(seconds):
+    """Formats a duration compactly, e.g. 12 ms, 3.4 s or 2.5 min."""
+    if seconds < 1:
+        return f"{seconds * 1000:.0f} ms"
+    if seconds < 60:
+        return f"{seconds:.1f} s"
+    return f"{seconds / 60:.1f} min"
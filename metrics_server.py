@@ -0,0 +1,219 @@
+# metrics_server.py
+import asyncio
+import logging
+import math
+import os
+import time
+
+from aiohttp import web
+
+log = logging.getLogger(__name__)
+
+# Port of the Prometheus metrics endpoint, the endpoint is disabled if unset
+METRICS_PORT = os.getenv("METRICS_PORT")
+# Only reachable locally by default, set to 0.0.0.0 in a container whose port
+# is published
+METRICS_HOST = os.getenv("METRICS_HOST") or "127.0.0.1"
+
+# Prefix of every exported metric
+PREFIX = "keroppi"
+
+# How often the event loop lag is sampled, in seconds
+LOOP_LAG_INTERVAL = 1.0
+
+# Histogram families: (metric name, label name, description)
+HISTOGRAMS = {
+    "commands": (
+        "command_duration_seconds",
+        "command",
+        "Time from invoking a command until it finished.",
+    ),
+    "docker_calls": (
+        "docker_call_duration_seconds",
+        "operation",
+        "Time spent in calls to the Docker API.",
+    ),
+    "worker_jobs": (
+        "worker_job_duration_seconds",
+        "job",
+        "Time heavy jobs took in a worker process or thread.",
+    ),
+}
+
+# Counter families: (metric name, label name, description)
+COUNTERS = {
+    "command_errors": (
+        "command_errors_total",
+        "command",
+        "Commands that failed with an error.",
+    ),
+    "command_cancellations": (
+        "command_cancellations_total",
+        "command",
+        "Commands that were cancelled before finishing.",
+    ),
+    "view_timeouts": (
+        "view_timeouts_total",
+        "view",
+        "Interactive views nobody answered in time.",
+    ),
+    "prompt_timeouts": (
+        "prompt_timeouts_total",
+        "event",
+        "Interactive prompts nobody answered in time.",
+    ),
+    "loop_stalls": (
+        "event_loop_stalls_total",
+        "site",
+        "Times a blocking call stalled the event loop, by call site.",
+    ),
+    "gateway_events": (
+        "gateway_events_total",
+        "shard",
+        "Events received from the Discord gateway.",
+    ),
+    "gateway_reconnects": (
+        "gateway_reconnects_total",
+        "shard",
+        "Times a shard's gateway connection was reestablished.",
+    ),
+    "rate_limits": (
+        "discord_http_429_total",
+        "scope",
+        "HTTP 429 responses received from Discord.",
+    ),
+    "worker_restarts": (
+        "worker_restarts_total",
+        "worker",
+        "Worker processes that died and were restarted.",
+    ),
+    "coalesced_calls": (
+        "coalesced_calls_total",
+        "request",
+        "Requests answered by an identical request's fetch instead of their own.",
+    ),
+}
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "NaN"
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _header(lines, name, kind, description):
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def render(bot, loop_lag):
+    """Renders the bot's metrics in the Prometheus text exposition format."""
+    metrics = bot.metrics
+    lines = []
+
+    gauges = {
+        "discord_gateway_latency_seconds": (
+            "Latency between a gateway heartbeat and its acknowledgement.",
+            lambda: bot.latency,
+        ),
+        "event_loop_lag_seconds": (
+            "How late the event loop ran a timer, sampled every second.",
+            lambda: loop_lag,
+        ),
+        "uptime_seconds": (
+            "Seconds since the bot started.",
+            lambda: time.time() - metrics.started,
+        ),
+        **metrics.gauges,
+    }
+    for name, (description, callback) in sorted(gauges.items()):
+        try:
+            value = callback()
+        except Exception as e:
+            log.error(f"Failed to read metric {name}: {e}")
+            continue
+        _header(lines, f"{PREFIX}_{name}", "gauge", description)
+        lines.append(f"{PREFIX}_{name} {_number(value)}")
+
+    name = f"{PREFIX}_shard_latency_seconds"
+    _header(lines, name, "gauge", "Gateway heartbeat latency of each shard.")
+    for shard, latency in bot.shard_stats.latencies(bot):
+        lines.append(f'{name}{{shard="{shard}"}} {_number(latency)}')
+
+    for family, (name, label, description) in COUNTERS.items():
+        name = f"{PREFIX}_{name}"
+        _header(lines, name, "counter", description)
+        for value, count in sorted(metrics.counters[family].items()):
+            lines.append(f'{name}{{{label}="{_label(value)}"}} {count}')
+
+    for family, (name, label, description) in HISTOGRAMS.items():
+        name = f"{PREFIX}_{name}"
+        _header(lines, name, "histogram", description)
+        for value, histogram in sorted(metrics.histograms[family].items()):
+            value = _label(value)
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket{{{label}="{value}",le="{bound}"}} {cumulative}'
+                )
+            lines.append(
+                f'{name}_bucket{{{label}="{value}",le="+Inf"}} {histogram.count}'
+            )
+            lines.append(f'{name}_sum{{{label}="{value}"}} {_number(histogram.sum)}')
+            lines.append(f'{name}_count{{{label}="{value}"}} {histogram.count}')
+
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Serves `/metrics` from the bot's own event loop.
+
+    Everything is read from memory when Prometheus scrapes, so a scrape never
+    waits on Discord or the disk.
+    """
+
+    def __init__(self, bot, host=METRICS_HOST, port=METRICS_PORT):
+        self.bot = bot
+        self.host = host
+        self.port = int(port)
+        self.loop_lag = 0.0
+        self.runner = None
+        self.lag_task = None
+
+    async def handle_metrics(self, request):
+        return web.Response(
+            text=render(self.bot, self.loop_lag),
+            headers={
+                "Content-Type": "text/plain; version=0.0.4; charset=utf-8",
+                "Cache-Control": "no-store",
+            },
+        )
+
+    async def measure_loop_lag(self):
+        """Samples how much later than requested a sleep wakes up."""
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            self.loop_lag = max(0.0, time.perf_counter() - start - LOOP_LAG_INTERVAL)
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle_metrics)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        self.lag_task = asyncio.create_task(self.measure_loop_lag())
+        log.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self.lag_task is not None:
+            self.lag_task.cancel()
+        if self.runner is not None:
+            await self.runner.cleanup()
@@ -0,0 +1,130 @@
+# search_index.py
+import json
+import os
+import sqlite3
+import threading
+
+# Database file holding the full-text index of archived and exported messages
+SEARCH_DB = os.path.join("./config", "search.db")
+
+# Only the most recent matches are ranked, which keeps very common words fast
+RANK_CANDIDATES = 5000
+
+
+def jump_url(guild_id, channel_id, message_id):
+    """Builds a link that jumps to a message in the Discord client."""
+    return f"https://discord.com/channels/{guild_id}/{channel_id}/{message_id}"
+
+
+class SearchIndex:
+    """SQLite FTS5 index over archived and exported messages.
+
+    Messages are keyed by their ID, so indexing the same message twice (for
+    example when it is archived and later exported) replaces the old row.
+    All methods block and should be run in a thread; a lock serializes them.
+    """
+
+    def __init__(self, path=SEARCH_DB):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS messages USING fts5(
+                content,
+                author,
+                guild_id UNINDEXED,
+                channel_id UNINDEXED,
+                created_at UNINDEXED,
+                tokenize = 'unicode61 remove_diacritics 2'
+            )
+            """)
+
+    def add(self, records):
+        """Indexes serialized messages (see `exporter.serialize_message`)."""
+        rows = [
+            (
+                record["id"],
+                record["content"],
+                record["author"]["display_name"],
+                record["guild_id"],
+                record["channel_id"],
+                record["created_at"],
+            )
+            for record in records
+            if record["content"] and record["guild_id"]
+        ]
+        if not rows:
+            return
+        with self.lock, self.connection:
+            # The message ID doubles as the rowid
+            self.connection.executemany(
+                "DELETE FROM messages WHERE rowid = ?", [(row[0],) for row in rows]
+            )
+            self.connection.executemany(
+                "INSERT INTO messages (rowid, content, author, guild_id, channel_id, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def search(self, guild_id, query, channel_ids, limit=10):
+        """Returns the best matching messages of a guild, ranked by BM25.
+
+        Only messages from `channel_ids` are searched. Every word of the query
+        must match; words are quoted so user input can't be interpreted as
+        FTS5 query syntax. Only the newest `RANK_CANDIDATES` matches are
+        ranked.
+        """
+        terms = " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+        if not terms or not channel_ids:
+            return []
+        channels = json.dumps(list(channel_ids))
+        with self.lock:
+            # Walking the matches newest first is cheap in FTS5 and gives the
+            # oldest message ID that still takes part in the ranking
+            cutoff = self.connection.execute(
+                """
+                SELECT rowid FROM messages
+                WHERE messages MATCH ? AND guild_id = ?
+                  AND channel_id IN (SELECT value FROM json_each(?))
+                ORDER BY rowid DESC
+                LIMIT 1 OFFSET ?
+                """,
+                (terms, guild_id, channels, RANK_CANDIDATES - 1),
+            ).fetchone()
+            cursor = self.connection.execute(
+                """
+                SELECT rowid, author, channel_id, created_at,
+                       snippet(messages, 0, '**', '**', '…', 16)
+                FROM messages
+                WHERE messages MATCH ? AND guild_id = ? AND rowid >= ?
+                  AND channel_id IN (SELECT value FROM json_each(?))
+                ORDER BY rank
+                LIMIT ?
+                """,
+                (terms, guild_id, cutoff[0] if cutoff else 0, channels, limit),
+            )
+            return [
+                {
+                    "id": message_id,
+                    "author": author,
+                    "channel_id": channel_id,
+                    "created_at": created_at,
+                    "snippet": snippet,
+                    "url": jump_url(guild_id, channel_id, message_id),
+                }
+                for message_id, author, channel_id, created_at, snippet in cursor
+            ]
+
+    def count(self):
+        """Returns the number of indexed messages."""
+        with self.lock:
+            (count,) = self.connection.execute(
+                "SELECT COUNT(*) FROM messages"
+            ).fetchone()
+        return count
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,97 @@
+# shard_stats.py
+import collections
+import math
+import time
+
+from metrics import format_duration
+
+# Seconds over which the event rate of a shard is averaged
+RATE_WINDOW = 60
+
+
+def format_latency(seconds):
+    """Formats a heartbeat latency; discord.py reports inf or nan for a shard
+    that hasn't had a heartbeat acknowledged yet."""
+    if not math.isfinite(seconds):
+        return "connecting…"
+    return format_duration(seconds)
+
+
+class ShardStats:
+    """Gateway health per shard: events received and reconnects.
+
+    discord.py hands every new gateway websocket to the connection state
+    before using it. That hook wraps the websocket's dispatcher to count the
+    events it receives under its shard, and every websocket after a shard's
+    first one is a reconnect (resumed or identified anew). A bot without
+    shards reports everything under shard 0.
+    """
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.connections = collections.Counter()  # shard -> websockets opened
+        # shard -> [second, events] buckets of the last RATE_WINDOW seconds
+        self.buckets = collections.defaultdict(
+            lambda: collections.deque(maxlen=RATE_WINDOW)
+        )
+
+    def install(self, bot):
+        state = bot._connection
+        update_references = state._update_references
+
+        def count_connection(ws):
+            update_references(ws)
+            shard = ws.shard_id or 0
+            self.connections[shard] += 1
+            if self.connections[shard] > 1:
+                self.metrics.inc("gateway_reconnects", str(shard))
+            ws._dispatch = self.counting_dispatch(shard, ws._dispatch)
+
+        state._update_references = count_connection
+
+    def counting_dispatch(self, shard, dispatch):
+        label = str(shard)
+        events = self.metrics.counters["gateway_events"]
+        buckets = self.buckets[shard]
+
+        def counted(event, *args, **kwargs):
+            # Sent once for every event the websocket receives
+            if event == "socket_event_type":
+                events[label] += 1
+                second = int(time.monotonic())
+                if buckets and buckets[-1][0] == second:
+                    buckets[-1][1] += 1
+                else:
+                    buckets.append([second, 1])
+            return dispatch(event, *args, **kwargs)
+
+        return counted
+
+    def rate(self, shard):
+        """Events per second the shard received over the last RATE_WINDOW seconds."""
+        since = int(time.monotonic()) - RATE_WINDOW
+        recent = (n for second, n in self.buckets.get(shard, ()) if second > since)
+        return sum(recent) / RATE_WINDOW
+
+    def reconnects(self, shard):
+        return max(0, self.connections[shard] - 1)
+
+    @staticmethod
+    def latencies(bot):
+        """Returns [(shard, seconds)] of the gateway heartbeat latency."""
+        if hasattr(bot, "latencies"):
+            return bot.latencies
+        return [(0, bot.latency)]
+
+    def summary(self, bot):
+        """Returns (shard, latency, events per second, reconnects) per shard."""
+        latencies = dict(self.latencies(bot))
+        return [
+            (
+                shard,
+                latencies.get(shard, float("nan")),
+                self.rate(shard),
+                self.reconnects(shard),
+            )
+            for shard in sorted(latencies.keys() | self.connections.keys())
+        ]
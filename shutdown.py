@@ -0,0 +1,76 @@
+# shutdown.py
+import asyncio
+import logging
+import os
+import signal
+
+from discord.ext import commands
+
+log = logging.getLogger(__name__)
+
+# Seconds running commands get to finish after a shutdown was requested.
+# `docker stop` kills the container 10 seconds after SIGTERM, so the default
+# leaves time to close the connection and write everything out afterwards
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "6"))
+
+
+class ShutdownCoordinator:
+    """Shuts the bot down in order when it receives SIGTERM or SIGINT.
+
+    1. New commands are refused.
+    2. Running commands get `timeout` seconds to finish, then are cancelled.
+    3. The bot is closed. That unloads every cog, and each cog stores its
+       queued work (pending deletions, scheduled messages) and closes its own
+       resources (Docker client, HTTP sessions, databases). Then the gateway
+       and HTTP connections are closed.
+
+    `bot.start()` returns after step 3, and `main()` then flushes the
+    settings store.
+    """
+
+    def __init__(self, bot, timeout=SHUTDOWN_TIMEOUT):
+        self.bot = bot
+        self.timeout = timeout
+        self.stopping = False
+        self.task = None
+
+    def install(self, loop):
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(signum, self.request, signum.name)
+            except NotImplementedError:
+                # Windows, where Ctrl+C still raises KeyboardInterrupt
+                pass
+        self.bot.add_check(self.accepting_commands)
+
+    def accepting_commands(self, ctx):
+        if self.stopping:
+            raise commands.CheckFailure(
+                "🔌 The bot is shutting down, please try again in a moment."
+            )
+        return True
+
+    def request(self, reason):
+        if self.stopping:
+            log.warning(f"Received {reason} again, already shutting down.")
+            return
+        self.stopping = True
+        log.info(f"Received {reason}, shutting down.")
+        self.task = asyncio.ensure_future(self.shutdown())
+
+    async def shutdown(self):
+        running = {task for task in self.bot.running_commands if not task.done()}
+        if running:
+            log.info(f"Waiting up to {self.timeout:g}s for {len(running)} commands.")
+            _, pending = await asyncio.wait(running, timeout=self.timeout)
+            if pending:
+                log.warning(f"Cancelling {len(pending)} commands that didn't finish.")
+                for task in pending:
+                    task.cancel()
+                await asyncio.wait(pending, timeout=2)
+
+        try:
+            await self.bot.close()
+        except Exception:
+            log.exception("Error while closing the bot.")
+        log.info("Bot closed.")
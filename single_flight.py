@@ -0,0 +1,55 @@
+# single_flight.py
+import asyncio
+import functools
+import os
+import time
+
+# Seconds a finished fetch is still handed to identical requests, 0 only
+# shares fetches that are still running
+COALESCE_WINDOW = float(os.getenv("COALESCE_WINDOW", "2"))
+
+
+class SingleFlight:
+    """Shares one fetch between identical requests that arrive together.
+
+    Requests are identified by a name and a tuple of arguments. The first one
+    starts the fetch; identical requests while it runs, or within `window`
+    seconds after it succeeded, get its result instead of fetching again.
+    Exceptions aren't kept, the next request after one fetches anew. Every
+    request answered without a fetch counts as a coalesced call.
+    """
+
+    def __init__(self, metrics, window=COALESCE_WINDOW):
+        self.metrics = metrics
+        self.window = window
+        self.flights = {}  # (name, args) -> task of the running fetch
+        self.results = {}  # (name, args) -> (finished, result)
+
+    async def run(self, name, args, fetch):
+        """Returns the result of `fetch()`, shared with identical requests."""
+        key = (name, args)
+        finished = self.results.get(key)
+        if finished is not None and time.monotonic() - finished[0] < self.window:
+            self.metrics.inc("coalesced_calls", name)
+            return finished[1]
+
+        task = self.flights.get(key)
+        if task is None:
+            task = asyncio.create_task(fetch())
+            task.add_done_callback(functools.partial(self.landed, key))
+            self.flights[key] = task
+        else:
+            self.metrics.inc("coalesced_calls", name)
+        # Shielded so a request that is cancelled doesn't cancel the fetch
+        # the others are waiting for
+        return await asyncio.shield(task)
+
+    def landed(self, key, task):
+        del self.flights[key]
+        now = time.monotonic()
+        # Forget results that can't be handed out anymore
+        self.results = {
+            k: v for k, v in self.results.items() if now - v[0] < self.window
+        }
+        if not task.cancelled() and task.exception() is None and self.window > 0:
+            self.results[key] = (now, task.result())
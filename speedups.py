@@ -0,0 +1,64 @@
+# speedups.py
+import json
+import logging
+import os
+
+import discord.utils
+
+log = logging.getLogger(__name__)
+
+# Set to 1 to run the event loop on uvloop and encode and decode gateway
+# payloads with orjson. Both are optional, see requirements-speed.txt. With 0
+# the standard json module is used even if orjson is installed, which
+# discord.py would otherwise pick up on its own
+SPEEDUPS = os.getenv("SPEEDUPS", "0") == "1"
+
+
+def use_orjson():
+    """Makes discord.py encode and decode JSON with orjson. Returns False if
+    orjson is not installed."""
+    try:
+        import orjson
+    except ImportError:
+        return False
+    discord.utils.HAS_ORJSON = True
+    discord.utils._from_json = orjson.loads
+    discord.utils._to_json = lambda obj: orjson.dumps(obj).decode("utf-8")
+    return True
+
+
+def use_stdlib_json():
+    """Makes discord.py use the standard library's json module, also when
+    orjson is installed."""
+    discord.utils.HAS_ORJSON = False
+    discord.utils._from_json = json.loads
+    discord.utils._to_json = lambda obj: json.dumps(
+        obj, separators=(",", ":"), ensure_ascii=True
+    )
+
+
+def uvloop_factory():
+    """Returns uvloop's event loop constructor, or None if it is not installed."""
+    try:
+        import uvloop
+    except ImportError:
+        return None
+    return uvloop.new_event_loop
+
+
+def install(enabled=SPEEDUPS):
+    """Applies the speedups if enabled and returns the event loop factory to
+    run the bot with (None for the default loop)."""
+    if not enabled:
+        use_stdlib_json()
+        return None
+    if use_orjson():
+        log.info("Using orjson for gateway payloads.")
+    else:
+        log.warning("SPEEDUPS is on but orjson is not installed.")
+    loop_factory = uvloop_factory()
+    if loop_factory is not None:
+        log.info("Using the uvloop event loop.")
+    else:
+        log.warning("SPEEDUPS is on but uvloop is not installed.")
+    return loop_factory
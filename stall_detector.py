@@ -0,0 +1,149 @@
+# stall_detector.py
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+
+log = logging.getLogger(__name__)
+
+# Seconds the event loop may go without running before it counts as stalled,
+# 0 disables the detector
+STALL_THRESHOLD = float(os.getenv("STALL_THRESHOLD", "0.5"))
+
+# Directory of the bot's own code, stalls are attributed to the innermost
+# frame inside it rather than to the library call that blocked
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class StallSite:
+    """Everything known about the stalls at one call site."""
+
+    def __init__(self, site, stack):
+        self.site = site
+        self.stack = stack  # Formatted stack of the first stall seen here
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last_seen = None
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.last_seen = time.time()
+
+
+def call_site(stack):
+    """Returns "file:line in function" of the innermost frame of the bot's own code."""
+    for frame in reversed(stack):
+        path = os.path.abspath(frame.filename)
+        if path.startswith(PROJECT_DIR) and "site-packages" not in path:
+            filename = os.path.relpath(path, PROJECT_DIR)
+            return f"{filename}:{frame.lineno} in {frame.name}"
+    if stack:
+        frame = stack[-1]
+        return f"{os.path.basename(frame.filename)}:{frame.lineno} in {frame.name}"
+    return "unknown"
+
+
+def is_idle(frame):
+    """Whether the loop's innermost frame means it is waiting for I/O."""
+    if frame.name == "select":
+        return True
+    # uvloop waits in C, below the frame that started the loop
+    return os.path.basename(frame.filename) == "runners.py"
+
+
+class StallDetector:
+    """Watchdog thread that catches blocking calls on the event loop.
+
+    A callback on the loop records a heartbeat every `threshold / 4` seconds.
+    If the watchdog thread sees no heartbeat for longer than the threshold,
+    it captures the stack of the loop's thread while it is still blocked.
+    Once the loop runs again, the heartbeat measures how long the stall
+    lasted and files it under the call site, so repeated stalls in the same
+    place are logged in full only once and can be ranked.
+    """
+
+    def __init__(self, metrics=None, threshold=STALL_THRESHOLD):
+        self.metrics = metrics
+        self.threshold = threshold
+        self.interval = threshold / 4
+        self.sites = {}  # call site -> StallSite
+        self.lock = threading.Lock()
+        self.pending = None  # Stack captured during the current stall
+        self.last_tick = time.monotonic()
+        self.loop = None
+        self.loop_thread_id = None
+        self.handle = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self, loop=None):
+        self.loop = loop or asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.last_tick = time.monotonic()
+        self.handle = self.loop.call_later(self.interval, self.tick)
+        self.thread = threading.Thread(
+            target=self.watch, name="stall-detector", daemon=True
+        )
+        self.thread.start()
+        log.info(f"Watching for event loop stalls over {self.threshold:g}s.")
+
+    def stop(self):
+        self.stopped.set()
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+
+    def tick(self):
+        """Heartbeat, runs on the event loop."""
+        now = time.monotonic()
+        late = now - self.last_tick - self.interval
+        self.last_tick = now
+        with self.lock:
+            stack, self.pending = self.pending, None
+        if stack is not None:
+            self.record(stack, late)
+        self.handle = self.loop.call_later(self.interval, self.tick)
+
+    def watch(self):
+        """Watchdog, runs in its own thread."""
+        while not self.stopped.wait(self.interval):
+            if time.monotonic() - self.last_tick <= self.threshold:
+                continue
+            with self.lock:
+                if self.pending is not None:
+                    continue  # Already captured this stall
+                frame = sys._current_frames().get(self.loop_thread_id)
+                stack = traceback.extract_stack(frame) if frame else None
+                if not stack or is_idle(stack[-1]):
+                    # The loop is idle; the machine was suspended or starved
+                    # of CPU, nothing on the loop blocked it
+                    continue
+                self.pending = stack
+
+    def record(self, stack, duration):
+        site = call_site(stack)
+        stall = self.sites.get(site)
+        if stall is None:
+            stall = self.sites[site] = StallSite(site, "".join(stack.format()))
+            log.warning(
+                f"Event loop stalled for {duration:.2f}s at {site}:\n{stall.stack}"
+            )
+        else:
+            log.warning(
+                f"Event loop stalled for {duration:.2f}s at {site} "
+                f"(seen {stall.count + 1} times)"
+            )
+        stall.add(duration)
+        if self.metrics is not None:
+            self.metrics.inc("loop_stalls", site)
+
+    def top(self, n=10):
+        """Returns the call sites that stalled the loop the longest in total."""
+        stalls = sorted(self.sites.values(), key=lambda stall: stall.total)
+        return stalls[::-1][:n]
@@ -0,0 +1,86 @@
+# task_registry.py
+import asyncio
+import functools
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+# Seconds a cog's tasks get to finish after being cancelled on unload
+CANCEL_TIMEOUT = 5.0
+
+
+class TrackedTask:
+    """A background task together with who started it and when."""
+
+    def __init__(self, task, name, owner):
+        self.task = task
+        self.name = name
+        self.owner = owner
+        self.started = time.time()
+
+
+class TaskRegistry:
+    """Keeps track of the background tasks cogs start.
+
+    Cogs spawn their background work through `bot.tasks.spawn(self, coro)`
+    instead of creating tasks themselves. When a cog is removed, which
+    happens on unload, reload and shutdown, the bot cancels the tasks it
+    spawned and waits for them, so nothing keeps running against the old
+    instance of the cog.
+    """
+
+    def __init__(self):
+        self.tasks = {}  # owner -> {task: TrackedTask}
+
+    @staticmethod
+    def owner_name(owner):
+        return getattr(owner, "qualified_name", owner)
+
+    def spawn(self, owner, coro, name=None):
+        """Runs `coro` in a task owned by `owner` (a cog or its name)."""
+        owner = self.owner_name(owner)
+        name = name or getattr(coro, "__qualname__", "task")
+        task = asyncio.get_running_loop().create_task(coro, name=f"{owner}: {name}")
+        self.tasks.setdefault(owner, {})[task] = TrackedTask(task, name, owner)
+        task.add_done_callback(functools.partial(self.finished, owner))
+        return task
+
+    def finished(self, owner, task):
+        tasks = self.tasks.get(owner, {})
+        tracked = tasks.pop(task, None)
+        if not tasks:
+            self.tasks.pop(owner, None)
+        if task.cancelled() or tracked is None:
+            return
+        error = task.exception()
+        if error is not None:
+            log.error(
+                f"Task {tracked.name!r} of {tracked.owner} failed: {error}",
+                exc_info=error,
+            )
+
+    def live(self, owner=None):
+        """Returns the running tasks, of one owner or of all, oldest first."""
+        if owner is None:
+            tracked = [t for tasks in self.tasks.values() for t in tasks.values()]
+        else:
+            tracked = list(self.tasks.get(self.owner_name(owner), {}).values())
+        return sorted(tracked, key=lambda t: t.started)
+
+    async def cancel(self, owner, timeout=CANCEL_TIMEOUT):
+        """Cancels an owner's tasks and waits up to `timeout` seconds for them."""
+        current = asyncio.current_task()
+        tasks = [
+            t.task
+            for t in self.live(owner)
+            if t.task is not current and not t.task.done()
+        ]
+        if not tasks:
+            return
+        for task in tasks:
+            task.cancel()
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        if pending:
+            names = ", ".join(task.get_name() for task in pending)
+            log.warning(f"Tasks still running after being cancelled: {names}")
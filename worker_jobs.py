@@ -0,0 +1,102 @@
+# worker_jobs.py
+# Heavy jobs the bot can hand to its worker processes. Arguments and results
+# are plain JSON values, so a job runs the same in a worker process as in the
+# bot's own process when no workers are configured
+import aiohttp
+import docker
+
+from attachment_mirror import download
+from exporter import ChannelExport
+
+_docker_client = None  # Created on first use, once per process
+_http_session = None  # Likewise, shared by the attachment downloads
+
+
+def docker_client():
+    global _docker_client
+    if _docker_client is None:
+        _docker_client = docker.from_env()
+    return _docker_client
+
+
+def close_docker_client():
+    global _docker_client
+    if _docker_client is not None:
+        _docker_client.close()
+        _docker_client = None
+
+
+def http_session():
+    global _http_session
+    if _http_session is None:
+        _http_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=300))
+    return _http_session
+
+
+async def close_http_session():
+    global _http_session
+    if _http_session is not None:
+        await _http_session.close()
+        _http_session = None
+
+
+def container_info(container):
+    """Returns what the bot shows about a container."""
+    return {
+        "name": container.name,
+        "image": (
+            container.image.tags[0]
+            if container.image.tags
+            else container.image.short_id
+        ),
+        "status": container.status,
+        "started_at": container.attrs.get("State", {}).get("StartedAt"),
+    }
+
+
+def docker_list(all=False, filters=None):
+    """Lists containers, by default only the running ones."""
+    containers = docker_client().containers.list(all=all, filters=filters)
+    return [container_info(container) for container in containers]
+
+
+def docker_action(name, action):
+    """Starts, stops, restarts or removes a container by name."""
+    container = docker_client().containers.get(name)
+    if action == "remove":
+        container.remove(force=True)
+    elif action in ("start", "stop", "restart"):
+        getattr(container, action)()
+    else:
+        raise ValueError(f"Unknown container action {action!r}")
+    return {"name": container.name}
+
+
+def export_write_batch(channel_id, records):
+    """Appends a batch to a channel's export and returns its new checkpoint."""
+    export = ChannelExport(channel_id)
+    export.load_checkpoint()
+    export.write_batch(records)
+    return {
+        "last_message_id": export.last_message_id,
+        "count": export.count,
+        "offset": export.offset,
+    }
+
+
+async def attachment_fetch(url, directory):
+    """Downloads an attachment into a temporary file of the mirror.
+
+    Returns [temporary path, SHA-256 digest, size]; the bot files it into the
+    mirror itself, which keeps the mirror's index in one process.
+    """
+    return list(await download(http_session(), url, directory))
+
+
+# Job name -> function, either blocking or a coroutine function
+JOBS = {
+    "docker.list": docker_list,
+    "docker.action": docker_action,
+    "export.write_batch": export_write_batch,
+    "attachment.fetch": attachment_fetch,
+}
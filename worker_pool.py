@@ -0,0 +1,321 @@
+# worker_pool.py
+import argparse
+import asyncio
+import inspect
+import json
+import logging
+import os
+import shutil
+import signal
+import stat
+import sys
+import tempfile
+import time
+
+log = logging.getLogger(__name__)
+
+# Number of worker processes for heavy jobs (Docker calls, export writes,
+# attachment downloads). 0 runs them in threads of the bot's own process
+WORKERS = int(os.getenv("WORKERS", "0"))
+
+# Directory for the workers' Unix sockets, a new private temporary directory
+# for every run if not set
+WORKER_SOCKET_DIR = os.getenv("WORKER_SOCKET_DIR") or None
+
+# Seconds a worker gets to open its socket after being started
+WORKER_START_TIMEOUT = 30.0
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class WorkerError(Exception):
+    """A job failed; `kind` is the name of the exception it raised."""
+
+    def __init__(self, kind, message):
+        super().__init__(message)
+        self.kind = kind
+
+
+def check_private_directory(path):
+    """Creates the socket directory, or checks that an existing one belongs
+    to this user and nobody else can enter it.
+
+    Otherwise another local user could pre-create it to impersonate workers,
+    or connect to a worker and run jobs like removing containers.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if (
+        not stat.S_ISDIR(info.st_mode)
+        or info.st_uid != os.getuid()
+        or info.st_mode & 0o077
+    ):
+        raise RuntimeError(
+            f"{path} must be a directory of this user that only it can access (mode 0700)"
+        )
+
+
+async def send_message(writer, message):
+    """Writes one length-prefixed JSON message."""
+    data = json.dumps(message).encode("utf-8")
+    writer.write(len(data).to_bytes(4, "big") + data)
+    await writer.drain()
+
+
+async def read_message(reader):
+    """Reads one length-prefixed JSON message."""
+    size = int.from_bytes(await reader.readexactly(4), "big")
+    return json.loads(await reader.readexactly(size))
+
+
+async def run_job(jobs, job, args):
+    """Runs a job and returns its reply: {"result": ...} or {"error": ...}."""
+    try:
+        func = jobs[job]
+        if inspect.iscoroutinefunction(func):
+            result = await func(**args)
+        else:
+            result = func(**args)
+        return {"result": result}
+    except Exception as e:
+        return {"error": {"kind": type(e).__name__, "message": str(e)}}
+
+
+class LocalRunner:
+    """Runs jobs in the bot's own process, blocking ones in a thread."""
+
+    remote = False
+
+    def __init__(self, metrics=None):
+        self.metrics = metrics
+
+    async def run(self, job, /, **args):
+        from worker_jobs import JOBS
+
+        start = time.perf_counter()
+        try:
+            func = JOBS[job]
+            if inspect.iscoroutinefunction(func):
+                return await func(**args)
+            return await asyncio.to_thread(func, **args)
+        except Exception as e:
+            raise WorkerError(type(e).__name__, str(e)) from e
+        finally:
+            if self.metrics is not None:
+                self.metrics.observe("worker_jobs", job, time.perf_counter() - start)
+
+    async def stop(self):
+        from worker_jobs import close_docker_client
+
+        await asyncio.to_thread(close_docker_client)
+
+
+class Worker:
+    """One worker process and the bot's connection to it."""
+
+    def __init__(self, index, socket_dir):
+        self.index = index
+        self.path = os.path.join(socket_dir, f"worker-{index}.sock")
+        self.process = None
+        self.reader = None
+        self.writer = None
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "worker_pool", "--socket", self.path, cwd=PROJECT_DIR
+        )
+        deadline = time.monotonic() + WORKER_START_TIMEOUT
+        while True:
+            try:
+                self.reader, self.writer = await asyncio.open_unix_connection(self.path)
+                return
+            except (FileNotFoundError, ConnectionRefusedError):
+                if self.process.returncode is not None:
+                    raise RuntimeError(
+                        f"Worker {self.index} exited with {self.process.returncode}"
+                    )
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Worker {self.index} didn't start in time")
+                await asyncio.sleep(0.1)
+
+    async def call(self, job, args):
+        await send_message(self.writer, {"job": job, "args": args})
+        return await read_message(self.reader)
+
+    async def stop(self):
+        if self.writer is not None:
+            self.writer.close()
+        if self.process is not None and self.process.returncode is None:
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+
+
+class WorkerPool:
+    """Runs heavy jobs in separate processes, off the bot's event loop.
+
+    Every worker is a `python -m worker_pool` process serving one job at a
+    time on its own Unix socket. Jobs and replies are length-prefixed JSON
+    messages. A job waits for an idle worker; a worker that dies mid-job
+    fails that job and is replaced. If the replacement can't be started,
+    the jobs of its slot run in threads of the bot's process instead.
+    """
+
+    remote = True
+
+    def __init__(self, size=WORKERS, socket_dir=WORKER_SOCKET_DIR, metrics=None):
+        self.size = size
+        self.socket_dir = socket_dir
+        self.temporary_dir = False
+        self.metrics = metrics
+        self.workers = []
+        # Idle workers, None for a slot whose worker couldn't be restarted
+        self.idle = asyncio.Queue()
+        self.restarts = set()  # Tasks starting replacement workers
+        self.fallback = LocalRunner(metrics)
+
+    async def start(self):
+        if self.socket_dir is None:
+            self.socket_dir = tempfile.mkdtemp(prefix="keroppi-workers-")
+            self.temporary_dir = True
+        else:
+            check_private_directory(self.socket_dir)
+        self.workers = [Worker(index, self.socket_dir) for index in range(self.size)]
+        # Let every start finish before failing, so stop() finds them all
+        results = await asyncio.gather(
+            *(worker.start() for worker in self.workers), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        for worker in self.workers:
+            self.idle.put_nowait(worker)
+        if self.metrics is not None:
+            self.metrics.register_gauge(
+                "busy_workers",
+                "Worker processes running a job.",
+                lambda: self.size - self.idle.qsize(),
+            )
+        log.info(f"Started {self.size} worker processes.")
+
+    async def run(self, job, /, **args):
+        """Runs a job in a worker and returns its result, raises WorkerError."""
+        worker = await self.idle.get()
+        if worker is None:
+            try:
+                return await self.fallback.run(job, **args)
+            finally:
+                self.idle.put_nowait(None)
+
+        start = time.perf_counter()
+        try:
+            reply = await worker.call(job, args)
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            log.error(f"Worker {worker.index} died during {job}, restarting it.")
+            if self.metrics is not None:
+                self.metrics.inc("worker_restarts", str(worker.index))
+            await worker.stop()
+            self.schedule_restart(worker)
+            raise WorkerError("WorkerDied", f"The worker process died: {e}") from e
+        except BaseException:
+            # Cancelled while the worker is busy; its reply would be read by
+            # the next job, so replace it
+            await worker.stop()
+            self.schedule_restart(worker)
+            raise
+        else:
+            self.idle.put_nowait(worker)
+        finally:
+            if self.metrics is not None:
+                self.metrics.observe("worker_jobs", job, time.perf_counter() - start)
+
+        if "error" in reply:
+            raise WorkerError(reply["error"]["kind"], reply["error"]["message"])
+        return reply["result"]
+
+    def schedule_restart(self, worker):
+        task = asyncio.create_task(self.restart(worker))
+        self.restarts.add(task)
+        task.add_done_callback(self.restarts.discard)
+
+    async def restart(self, worker):
+        replacement = Worker(worker.index, self.socket_dir)
+        try:
+            await replacement.start()
+        except (OSError, RuntimeError) as e:
+            log.error(
+                f"Failed to restart worker {worker.index}, running its jobs in threads: {e}"
+            )
+            await replacement.stop()
+            self.idle.put_nowait(None)
+            return
+        except asyncio.CancelledError:
+            # The pool is stopping, don't leave the new process behind
+            await replacement.stop()
+            raise
+        self.workers[worker.index] = replacement
+        self.idle.put_nowait(replacement)
+
+    async def stop(self):
+        if self.metrics is not None:
+            self.metrics.unregister_gauge("busy_workers")
+        for task in self.restarts:
+            task.cancel()
+        await asyncio.gather(*self.restarts, return_exceptions=True)
+        await asyncio.gather(*(worker.stop() for worker in self.workers))
+        await self.fallback.stop()
+        if self.temporary_dir:
+            shutil.rmtree(self.socket_dir, ignore_errors=True)
+
+
+async def serve(path):
+    """Worker process: answers jobs on a Unix socket until terminated, or
+    until the bot's connection closes (also when the bot dies)."""
+    from worker_jobs import JOBS, close_http_session
+
+    stopped = asyncio.Event()
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                request = await read_message(reader)
+                reply = await run_job(JOBS, request["job"], request["args"])
+                await send_message(writer, reply)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            stopped.set()  # The bot closed the connection, nobody else will
+        except asyncio.CancelledError:
+            pass  # The worker is stopping
+        finally:
+            writer.close()
+
+    server = await asyncio.start_unix_server(handle, path)
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, stopped.set)
+    async with server:
+        await stopped.wait()
+    await close_http_session()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    from log_config import setup_logging
+
+    parser = argparse.ArgumentParser(description="Worker process for heavy jobs.")
+    parser.add_argument("--socket", required=True)
+    args = parser.parse_args()
+
+    load_dotenv()
+    log_listener = setup_logging()
+    # Ctrl+C reaches the whole process group; the bot stops the workers itself
+    # once it has finished shutting down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        asyncio.run(serve(args.socket))
+    finally:
+        log_listener.stop()